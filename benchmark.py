@@ -0,0 +1,341 @@
+"""Benchmark da carga, dos filtros, dos gráficos e dos indicadores do dashboard.
+
+Gera planilhas sintéticas com o mesmo layout do Excel lido por load_data
+(Tabela1 a Tabela7, duas linhas de título e o cabeçalho) em várias escalas
+de unidades e anos, mede cada etapa e grava os tempos em JSON para comparar
+versões:
+
+    python benchmark.py --escalas 1x2 20x5 --saida benchmark.json
+"""
+import os
+
+# Sem o observador: cada chamada de load_data mede a carga de verdade
+os.environ.setdefault('DASHBOARD_INTERVALO_OBSERVADOR', '0')
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+import dashboard
+from fontes import TABELAS, ORDEM_MESES, LINHAS_TITULO
+
+# Colunas de valores de cada planilha, na ordem do Excel, depois de
+# Unidade, Mês e Ano. Colunas "Total..." são contagens; as demais, reais
+COLUNAS = {
+    'Tabela1': ['Total Consultas Dia', 'Total Consultas Plantão'],
+    'Tabela2': [
+        'Total Consulta Dia - Novos', 'Faturamento Líquido Total Consulta Dia - Novos',
+        'Total Consulta Dia - Retornantes', 'Faturamento Líquido Total Consulta Dia - Retornantes',
+        'Total Consultas Dia - Google Novos', 'Faturamento Líquido Total Consultas Dia - Google Novos',
+        'Total Consulta Dia - Google Retornantes', 'Faturamento Líquido Total Consulta Dia - Google Retornantes',
+    ],
+    'Tabela3': [
+        'Total Consulta Plantão - Novos', 'Faturamento Líquido Total Consulta Plantão - Novos',
+        'Total Consulta Plantão - Retornantes', 'Faturamento Líquido Total Consulta Plantão - Retornantes',
+        'Total Consulta Plantão - Google Novos', 'Faturamento Líquido Total Consulta Plantão - Google Novos',
+        'Total Consulta Plantão - Google Retornantes', 'Faturamento Líquido Total Consulta Plantão - Google Retornantes',
+    ],
+    'Tabela4A': [
+        'Total Consulta Plantão Domingo/Feriado', 'Faturamento Líquido Total Consulta Plantão Domingo/Feriado',
+        'Total Consulta Plantão Noturno', 'Faturamento Líquido Total Consulta Plantão Noturno',
+        'Total Consulta Plantão Sábado', 'Faturamento Líquido Total Consulta Plantão Sábado',
+        'Total Consulta Procedimento Emergencial Plantão',
+        'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão',
+    ],
+    'Tabela4B': [
+        'Total Consulta Plantão Domingo/Feriado - Google Novos',
+        'Faturamento Líquido Total Consulta Plantão Domingo/Feriado - Google Novos',
+        'Total Consulta Plantão Domingo/Feriado - Google Retornantes',
+        'Faturamento Líquido Total Consulta Plantão Domingo/Feriado - Google Retornantes',
+    ],
+    'Tabela4C': [
+        'Total Consulta Plantão Sábado - Google Novos',
+        'Faturamento Líquido Total Consulta Plantão Sábado - Google Novos',
+        'Total Consulta Plantão Sábado - Google Retornantes',
+        'Faturamento Líquido Total Consulta Plantão Sábado - Google Retornantes',
+    ],
+    'Tabela4D': [
+        'Total Consulta Procedimento Emergencial Plantão - Google Novos',
+        'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão - Google Novos',
+        'Total Consulta Procedimento Emergencial Plantão - Google Retornantes',
+        'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão - Google Retornantes',
+    ],
+    'Tabela4E': [
+        'Total Consulta Plantão Noturno Google Novos',
+        'Faturamento Líquido Total Consulta Plantão Noturno Google Novos',
+        'Total Consulta Plantão Noturno Google Retornantes',
+        'Faturamento Líquido Total Consulta Plantão Noturno Google Retornantes',
+    ],
+    'Tabela5': [
+        'Total de Clientes Novos', 'Faturamento Clientes Novos',
+        'Total de Clientes Retornantes', 'Faturamento Clientes Retornantes',
+        'Total Clientes', 'Faturamento Total',
+    ],
+    'Tabela7': [
+        'Total Consultas Plantão', 'Faturamento Total Líquido de Serviços de Plantão',
+        'Faturamento Total Líquido Hospital', 'Ticket Médio de Atendimento de Plantão',
+        'Representatividade no Faturamento Total do Hospital (%)',
+    ],
+}
+
+# Escalas padrão: unidades x anos
+ESCALAS = [(u, a) for u in (1, 20, 200) for a in (2, 5, 15)]
+
+# Último ano das planilhas sintéticas
+ANO_FINAL = 2024
+
+def valores_sinteticos(nome, n, rng):
+    """Colunas de valores da planilha com n linhas, coerentes entre si"""
+    valores = {}
+    for coluna in COLUNAS[nome]:
+        if coluna.startswith('Total'):
+            valores[coluna] = rng.integers(0, 400, n)
+        else:
+            valores[coluna] = np.round(rng.uniform(0, 150_000, n), 2)
+    if nome == 'Tabela5':
+        valores['Total Clientes'] = valores['Total de Clientes Novos'] + valores['Total de Clientes Retornantes']
+        valores['Faturamento Total'] = np.round(
+            valores['Faturamento Clientes Novos'] + valores['Faturamento Clientes Retornantes'], 2
+        )
+    elif nome == 'Tabela7':
+        consultas = np.maximum(valores['Total Consultas Plantão'], 1)
+        plantao = valores['Faturamento Total Líquido de Serviços de Plantão']
+        hospital = plantao + valores['Faturamento Total Líquido Hospital']
+        valores['Total Consultas Plantão'] = consultas
+        valores['Faturamento Total Líquido Hospital'] = np.round(hospital, 2)
+        valores['Ticket Médio de Atendimento de Plantão'] = plantao / consultas
+        valores['Representatividade no Faturamento Total do Hospital (%)'] = plantao / hospital
+    return valores
+
+def gerar_planilha(caminho, unidades, anos, semente=0):
+    """Grava um Excel sintético com uma linha por unidade, ano e mês em cada planilha"""
+    rng = np.random.default_rng(semente)
+    nomes_unidades = [f'Unidade {i:03d}' for i in range(unidades)]
+    lista_anos = list(range(ANO_FINAL - anos + 1, ANO_FINAL + 1))
+    n = unidades * len(lista_anos) * len(ORDEM_MESES)
+
+    livro = openpyxl.Workbook(write_only=True)
+    for nome in TABELAS:
+        planilha = livro.create_sheet(nome)
+        planilha.append([f'ANÁLISE SINTÉTICA: {nome}'])
+        for _ in range(LINHAS_TITULO - 1):
+            planilha.append([])
+        planilha.append(['Unidade', 'Mês', 'Ano'] + COLUNAS[nome])
+        valores = valores_sinteticos(nome, n, rng)
+        colunas = [valores[coluna].tolist() for coluna in COLUNAS[nome]]
+        linha = 0
+        # Como no Excel original: ano a ano, mês a mês, todas as unidades
+        for ano in lista_anos:
+            for mes in ORDEM_MESES:
+                for unidade in nomes_unidades:
+                    # O Excel original guarda o ano como texto
+                    planilha.append([unidade, mes, str(ano)] + [c[linha] for c in colunas])
+                    linha += 1
+    livro.save(caminho)
+    return nomes_unidades, lista_anos
+
+def medir(funcao, repeticoes, preparar=None):
+    """Executa a função repetidas vezes; retorna os tempos em segundos"""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+# Os caches abaixo são internos do dashboard e podem não existir na revisão
+# medida: cada um só é esvaziado se estiver presente
+
+def limpar_carga(caminho, sidecar=True):
+    """Esquece as tabelas carregadas (e o sidecar), como em um processo novo"""
+    for nome in ('_carregar_tabelas', '_hash_arquivo'):
+        funcao = getattr(dashboard, nome, None)
+        if hasattr(funcao, 'clear'):
+            funcao.clear()
+    if hasattr(dashboard, '_ultima_carga'):
+        dashboard._ultima_carga().clear()
+    if sidecar and hasattr(dashboard, '_pasta_sidecar'):
+        shutil.rmtree(dashboard._pasta_sidecar(caminho), ignore_errors=True)
+
+def limpar_fatias():
+    """Esquece as fatias já filtradas, para medir o filtro e não a busca"""
+    if hasattr(dashboard, '_cache_fatias'):
+        dashboard._cache_fatias().limpar()
+
+def limpar_derivados():
+    """Esquece fatias e figuras em cache, para medir o cálculo e não a busca"""
+    limpar_fatias()
+    if hasattr(dashboard, '_cache_figuras'):
+        dashboard._cache_figuras().limpar()
+
+def carregar_todas(caminho):
+    """Lê todas as planilhas em uma única abertura do Excel, como a página com todas as métricas"""
+    tabelas = dashboard.load_data(caminho)
+    if isinstance(tabelas, tuple):
+        # Revisões anteriores devolvem as tabelas na ordem de TABELAS
+        return dict(zip(TABELAS, tabelas))
+    tabelas.antecipar(TABELAS)
+    return tabelas.carregadas()
+
+def carregar_primeira(caminho):
+    """Lê só a Tabela1, como a primeira página de uma sessão sem métricas"""
+    tabelas = dashboard.load_data(caminho)
+    if isinstance(tabelas, tuple):
+        return tabelas[0]
+    return tabelas['Tabela1']
+
+def medir_escala(pasta, unidades, anos, repeticoes, registrar):
+    """Mede todas as etapas para uma escala de unidades x anos"""
+    caminho = os.path.join(pasta, f'sintetico_{unidades}u_{anos}a.xlsx')
+    if not os.path.exists(caminho):
+        inicio = time.perf_counter()
+        gerar_planilha(caminho, unidades, anos)
+        print(f'  planilha gerada em {time.perf_counter() - inicio:.1f} s', file=sys.stderr)
+    # Uma carga antes das medições garante que as tabelas existem
+    limpar_carga(caminho)
+    tabelas = carregar_todas(caminho)
+    todas_unidades = sorted(tabelas['Tabela1']['Unidade'].unique())
+    todos_anos = sorted(tabelas['Tabela1']['Ano'].unique())
+    unidades_padrao, anos_padrao = dashboard.selecao_padrao(tabelas['Tabela1'])
+    selecoes = {
+        'padrao': (unidades_padrao, anos_padrao, ORDEM_MESES),
+        'todas': (todas_unidades, todos_anos, ORDEM_MESES),
+    }
+
+    # Carga de todas as planilhas: Excel sem sidecar, sidecar em um processo
+    # novo e cache em memória
+    registrar('carga', 'excel', None, medir(
+        lambda: carregar_todas(caminho), repeticoes, lambda: limpar_carga(caminho)
+    ))
+    registrar('carga', 'sidecar', None, medir(
+        lambda: carregar_todas(caminho), repeticoes, lambda: limpar_carga(caminho, sidecar=False)
+    ))
+    registrar('carga', 'memoria', None, medir(lambda: carregar_todas(caminho), repeticoes))
+    # Primeira página de uma sessão nova, sem métricas: só a Tabela1 é lida
+    registrar('carga', 'primeira_pagina', None, medir(
+        lambda: carregar_primeira(caminho), repeticoes, lambda: limpar_carga(caminho)
+    ))
+    tabelas = carregar_todas(caminho)
+
+    for nome_selecao, (u, a, m) in selecoes.items():
+        # Filtros: filtrar_selecao de cada tabela, com o cache de fatias vazio
+        for nome, df in tabelas.items():
+            registrar('filtro', nome, nome_selecao, medir(
+                lambda: dashboard.filtrar_selecao(df, u, a, m), repeticoes, limpar_fatias
+            ))
+
+        # Indicadores do cabeçalho e destaques
+        registrar('indicadores', 'cabecalho', nome_selecao, medir(
+            lambda: dashboard.calcular_indicadores(tabelas, u, a, m), repeticoes
+        ))
+        registrar('indicadores', 'plantao', nome_selecao, medir(
+            lambda: dashboard.calcular_indicadores_plantao(tabelas, u, a, m), repeticoes
+        ))
+        registrar('indicadores', 'destaques', nome_selecao, medir(
+            lambda: dashboard.calcular_destaques(tabelas['Tabela5'], u, a, m), repeticoes, limpar_derivados
+        ))
+
+        # Cada métrica: construção da figura e serialização para o navegador
+        for categoria, metricas in dashboard.METRICAS_DISPONIVEIS.items():
+            for metrica in metricas:
+                figuras = []
+
+                def construir():
+                    figuras.append(dashboard.construir_grafico(categoria, metrica, tabelas, u, a, m))
+
+                try:
+                    tempos = medir(construir, repeticoes, limpar_derivados)
+                except Exception as e:
+                    print(f'  {metrica} ({nome_selecao}): {e}', file=sys.stderr)
+                    continue
+                registrar('grafico', f'{categoria}/{metrica}', nome_selecao, tempos)
+                if figuras[-1] is not None:
+                    registrar('serializacao', f'{categoria}/{metrica}', nome_selecao, medir(
+                        lambda: pio.to_json(figuras[-1], validate=False), repeticoes
+                    ))
+
+def versao_codigo():
+    """Commit do git em que o benchmark foi executado, se disponível"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def escala(texto):
+    """Converte '20x5' em (20, 5)"""
+    try:
+        unidades, anos = (int(parte) for parte in texto.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'escala inválida: {texto} (use UNIDADESxANOS, ex.: 20x5)')
+    return unidades, anos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do dashboard com planilhas sintéticas.')
+    parser.add_argument('--escalas', nargs='+', type=escala, default=ESCALAS,
+                        help='escalas UNIDADESxANOS (padrão: 1, 20 e 200 unidades com 2, 5 e 15 anos)')
+    parser.add_argument('--repeticoes', type=int, default=3, help='execuções de cada medição')
+    parser.add_argument('--pasta', default='benchmark_planilhas',
+                        help='pasta das planilhas sintéticas (reaproveitadas entre execuções)')
+    parser.add_argument('--saida', default='benchmark.json', help='arquivo JSON com os resultados')
+    args = parser.parse_args(argv)
+    if hasattr(dashboard, '_silenciar_streamlit'):
+        dashboard._silenciar_streamlit()
+    os.makedirs(args.pasta, exist_ok=True)
+
+    resultados = []
+    for unidades, anos in args.escalas:
+        print(f'{unidades} unidades x {anos} anos', file=sys.stderr)
+
+        def registrar(etapa, nome, selecao, tempos):
+            resultados.append({
+                'unidades': unidades,
+                'anos': anos,
+                'etapa': etapa,
+                'nome': nome,
+                'selecao': selecao,
+                'tempos': tempos,
+                'minimo': min(tempos),
+                'mediana': statistics.median(tempos),
+            })
+            print(f'  {etapa:13s} {nome:55s} {selecao or "":7s} {min(tempos) * 1000:10.2f} ms', file=sys.stderr)
+
+        medir_escala(args.pasta, unidades, anos, args.repeticoes, registrar)
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': versao_codigo(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plotly': plotly.__version__,
+            'maquina': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'repeticoes': args.repeticoes,
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=1)
+    print(f'{len(resultados)} medições gravadas em {args.saida}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,98 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+import os
+import re
+import sys
+import html
+import argparse
+import hashlib
+import importlib
+import json
+import tempfile
+import itertools
+import weakref
+import zipfile
+import xml.etree.ElementTree as ET
+import threading
+import time
+import logging
+import multiprocessing
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import streamlit.logger
+
+from fontes import (
+    TABELAS, ORDEM_MESES, ler_tabelas, descobrir_planilhas,
+    nome_fonte, unidades_da_planilha, concatenar_fontes,
+    iniciar_observador_arquivo, parar_observador_arquivo
+)
+
+# Envio ao navegador do JSON de figuras já serializado (API interna do
+# Streamlit); sem ela, as figuras são exibidas normalmente com st.plotly_chart
+try:
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.elements.lib.form_utils import current_form_id
+except ImportError:
+    PlotlyChartProto = None
+
+# pyarrow é opcional: sem ele o dashboard sempre lê direto do Excel
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+class ModuloSobDemanda:
+    """Módulo importado no primeiro acesso a um de seus atributos"""
+
+    def __init__(self, nome):
+        self._nome = nome
+
+    def __getattr__(self, atributo):
+        # import_module usa a trava de importação do Python: threads que
+        # chegam juntas esperam a mesma importação
+        return getattr(importlib.import_module(self._nome), atributo)
+
+# O Plotly só é importado na primeira figura (ou em segundo plano, veja
+# preaquecer_graficos): a barra lateral e a página inicial não dependem dele
+px = ModuloSobDemanda('plotly.express')
+go = ModuloSobDemanda('plotly.graph_objects')
+pio = ModuloSobDemanda('plotly.io')
+
+def make_subplots(*args, **kwargs):
+    """make_subplots do Plotly, importado na primeira chamada"""
+    from plotly.subplots import make_subplots as criar_subplots
+    return criar_subplots(*args, **kwargs)
+
+# Módulos de gráficos importados no preaquecimento
+MODULOS_GRAFICOS = ['plotly.graph_objects', 'plotly.subplots', 'plotly.express', 'plotly.io']
+
+def _importar_modulos_graficos():
+    """Importa os módulos de gráficos; uma falha fica para a primeira figura"""
+    for nome in MODULOS_GRAFICOS:
+        try:
+            importlib.import_module(nome)
+        except ImportError as e:
+            logger.warning('Falha ao importar %s: %s', nome, e)
+            return
+
+@st.cache_resource
+def preaquecer_graficos():
+    """Importa o Plotly em segundo plano, uma vez por processo, enquanto as métricas são escolhidas"""
+    thread = threading.Thread(
+        target=_importar_modulos_graficos,
+        name='preaquecimento-graficos', daemon=True
+    )
+    thread.start()
+    return thread
 
 # Configuração da página - DEVE SER A PRIMEIRA CHAMADA STREAMLIT
 st.set_page_config(layout="wide", page_title="Dashboard Hospital Veterinário")
@@ -66,28 +154,913 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Namespaces do formato .xlsx usados para localizar as planilhas no arquivo
+_NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_RELACAO = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PACOTE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def _assinaturas_planilhas(caminho):
+    """Retorna ({planilha: assinatura}, textos compartilhados) lidos do diretório do .xlsx"""
+    # O .xlsx é um zip com um XML por planilha: o CRC e o tamanho de cada XML
+    # vêm do diretório do zip, sem descompactar nem interpretar as planilhas
+    with zipfile.ZipFile(caminho) as pacote:
+        relacoes = {
+            rel.get('Id'): rel.get('Target')
+            for rel in ET.fromstring(pacote.read('xl/_rels/workbook.xml.rels')).iter(f'{_NS_PACOTE}Relationship')
+        }
+        assinaturas = {}
+        for planilha in ET.fromstring(pacote.read('xl/workbook.xml')).iter(f'{_NS_PLANILHA}sheet'):
+            alvo = relacoes.get(planilha.get(f'{_NS_RELACAO}id'), '')
+            membro = alvo.lstrip('/') if alvo.startswith('/') else 'xl/' + alvo
+            try:
+                info = pacote.getinfo(membro)
+            except KeyError:
+                continue
+            assinaturas[planilha.get('name')] = f'{info.CRC:08x}:{info.file_size}'
+        try:
+            textos = [''.join(si.itertext()) for si in ET.fromstring(pacote.read('xl/sharedStrings.xml'))]
+        except KeyError:
+            textos = []
+    return assinaturas, textos
+
+def _resumo_textos(textos, quantidade):
+    """Hash dos primeiros textos compartilhados, referenciados pelas planilhas por posição"""
+    return hashlib.sha256('\x00'.join(textos[:quantidade]).encode('utf-8')).hexdigest()
+
+def _textos_preservados(registro_textos, textos):
+    """Indica se os textos compartilhados da carga anterior continuam nas mesmas posições"""
+    # Uma planilha com o mesmo XML só tem o mesmo conteúdo se os textos que
+    # ela referencia por posição não mudaram; textos novos entram no final
+    quantidade, resumo = registro_textos
+    return len(textos) >= quantidade and _resumo_textos(textos, quantidade) == resumo
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _hash_arquivo(caminho, mtime_ns, tamanho):
+    """Calcula o SHA-256 do conteúdo do arquivo"""
+    # mtime e tamanho fazem parte da chave apenas para que o hash seja
+    # recalculado quando o arquivo for regravado, e não a cada rerun
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def _assinatura_arquivo(excel_file):
+    """Retorna (caminho absoluto, mtime, hash do conteúdo) do arquivo Excel"""
+    caminho = os.path.abspath(excel_file)
+    info = os.stat(caminho)
+    return caminho, info.st_mtime_ns, _hash_arquivo(caminho, info.st_mtime_ns, info.st_size)
+
+def relatorio_memoria(tabelas):
+    """Memória ocupada por tabela ({nome: DataFrame}), para acompanhar o custo de cada sessão"""
+    return pd.DataFrame([
+        {
+            'Tabela': nome,
+            'Linhas': len(df),
+            'Colunas': df.shape[1],
+            'Memória (KB)': round(df.memory_usage(deep=True).sum() / 1024, 1),
+        }
+        for nome, df in tabelas.items()
+    ])
+
+# Versão do formato das tabelas gravadas no sidecar; mudanças na normalização
+# ou no esquema devem incrementá-la para que sidecars antigos sejam regerados
+FORMATO_SIDECAR = 4
+
+# Com vários processos do Streamlit no mesmo servidor, as tabelas são
+# publicadas uma única vez no sidecar e cada processo mapeia os mesmos
+# arquivos somente leitura, sem cópia própria (requer pyarrow)
+TABELAS_COMPARTILHADAS = os.environ.get('DASHBOARD_TABELAS_COMPARTILHADAS', '') not in ('', '0')
+
+# Pasta dos sidecars; vazia, cada sidecar fica ao lado do arquivo Excel. Em
+# memória compartilhada (por exemplo /dev/shm/dashboard) o mapeamento não
+# depende do disco
+PASTA_SIDECAR = os.environ.get('DASHBOARD_PASTA_SIDECAR', '')
+
+def _pasta_sidecar(caminho):
+    """Pasta com a cópia colunar (Arrow/Feather) das tabelas do Excel"""
+    if PASTA_SIDECAR:
+        # Arquivos com o mesmo nome em pastas diferentes não se misturam
+        chave = hashlib.sha256(caminho.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(PASTA_SIDECAR, f'{nome_fonte(caminho)}.{chave}.cache')
+    return os.path.splitext(caminho)[0] + '.cache'
+
+def _arquivo_sidecar(nome, assinatura):
+    """Nome do arquivo da tabela no sidecar; muda junto com a planilha"""
+    return f"{nome}.{assinatura.replace(':', '-')}.feather"
+
+def _ler_manifesto(caminho):
+    """Lê o manifesto do sidecar; None se não existir ou for de outro formato"""
+    if feather is None:
+        return None
+    try:
+        with open(os.path.join(_pasta_sidecar(caminho), 'manifesto.json'), encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if manifesto.get('formato') != FORMATO_SIDECAR:
+        return None
+    return manifesto
+
+def _ler_tabela_sidecar(caminho, nome, assinatura):
+    """Lê uma tabela do sidecar"""
+    # Arquivos sem compressão podem ser mapeados em memória diretamente
+    destino = os.path.join(_pasta_sidecar(caminho), _arquivo_sidecar(nome, assinatura))
+    tabela = feather.read_table(destino, memory_map=True)
+    if TABELAS_COMPARTILHADAS:
+        # Um bloco por coluna: as colunas numéricas sem ausentes ficam como
+        # visões do arquivo mapeado (páginas compartilhadas entre processos);
+        # só categorias e colunas com ausentes são copiadas
+        return tabela.to_pandas(split_blocks=True)
+    return tabela.to_pandas()
+
+@contextmanager
+def _trava_sidecar(pasta):
+    """Trava exclusiva da pasta do sidecar entre processos (e threads)"""
+    with open(os.path.join(pasta, 'manifesto.lock'), 'a+b') as arquivo:
+        if os.name == 'nt':
+            import msvcrt
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+
+def _publicadas_no_sidecar(caminho, assinaturas, registro_textos):
+    """Planilhas que o manifesto em disco lista com a assinatura atual"""
+    # Só vale um manifesto gravado para os mesmos textos compartilhados
+    manifesto = _ler_manifesto(caminho)
+    if manifesto is None or manifesto['textos'] != list(registro_textos):
+        return set()
+    pasta = _pasta_sidecar(caminho)
+    return {
+        nome for nome, assinatura in manifesto['planilhas'].items()
+        if assinaturas.get(nome) == assinatura
+        and os.path.exists(os.path.join(pasta, _arquivo_sidecar(nome, assinatura)))
+    }
+
+def _gravar_sidecar(caminho, assinaturas, registro_textos, lidas, gravadas):
+    """Acrescenta ao sidecar as tabelas lidas do Excel; retorna as planilhas gravadas"""
+    # Falhas apenas deixam o sidecar como estava
+    if feather is None:
+        return gravadas
+    pasta = _pasta_sidecar(caminho)
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        # Cada processo carrega planilhas diferentes: sob a trava, o manifesto
+        # em disco é relido e combinado com as planilhas deste processo
+        with _trava_sidecar(pasta):
+            publicadas = _publicadas_no_sidecar(caminho, assinaturas, registro_textos)
+            # Um único lote por tabela, para que cada coluna seja contígua no
+            # arquivo e possa ser mapeada sem cópia
+            for nome, df in lidas.items():
+                if nome in publicadas:
+                    continue
+                _gravar_atomico(pasta, _arquivo_sidecar(nome, assinaturas[nome]),
+                                lambda destino, df=df: feather.write_feather(
+                                    df, destino, compression='uncompressed', chunksize=max(len(df), 1)
+                                ))
+            novas = gravadas | publicadas | set(lidas)
+            # O manifesto é gravado por último: só lista tabelas já gravadas por
+            # completo (as planilhas ainda não usadas ficam de fora)
+            manifesto = {
+                'formato': FORMATO_SIDECAR,
+                'planilhas': {nome: assinaturas[nome] for nome in TABELAS if nome in novas},
+                'textos': list(registro_textos)
+            }
+            _gravar_atomico(pasta, 'manifesto.json',
+                            lambda destino: _gravar_json(destino, manifesto))
+            # Remove só as versões cuja assinatura não é mais a da planilha;
+            # uma versão ainda mapeada por outro processo pode não ser removível
+            atuais = {_arquivo_sidecar(nome, assinatura) for nome, assinatura in assinaturas.items()}
+            for arquivo in os.listdir(pasta):
+                if arquivo.endswith('.feather') and arquivo not in atuais:
+                    try:
+                        os.remove(os.path.join(pasta, arquivo))
+                    except OSError:
+                        pass
+        return novas
+    except (OSError, ValueError):
+        return gravadas
+
+def _gravar_atomico(pasta, nome, gravar):
+    """Grava em arquivo temporário e renomeia, para nunca expor arquivo parcial"""
+    fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    os.close(fd)
+    try:
+        gravar(temporario)
+        os.replace(temporario, os.path.join(pasta, nome))
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+def _gravar_json(destino, dados):
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+
+@st.cache_resource
+def _registro_indices():
+    """Índices (Unidade, Ano, Mês) por tabela, compartilhados pelo processo"""
+    return {}
+
+@st.cache_resource
+def _registro_cubos():
+    """Cubos de indicadores por tabela, compartilhados pelo processo"""
+    return {}
+
+def _por_tabela(registro, df, calcular):
+    """Retorna o valor derivado da tabela guardado no registro, calculando-o na primeira vez"""
+    # O valor é guardado pelo id da tabela; a referência fraca garante que
+    # um id reaproveitado por outro DataFrame não devolva um valor errado
+    entrada = registro.get(id(df))
+    if entrada is not None and entrada[0]() is df:
+        return entrada[1]
+    valor = calcular(df)
+    registro[id(df)] = (weakref.ref(df), valor)
+    weakref.finalize(df, registro.pop, id(df), None)
+    return valor
+
+@st.cache_resource
+def _registro_versoes():
+    """Versões das células (Unidade, Ano) por tabela, compartilhadas pelo processo"""
+    return {}
+
+def _versoes_celulas(df):
+    """Retorna {(Unidade, Ano): impressão digital das linhas da célula} da tabela"""
+    # Soma dos hashes das linhas: muda quando qualquer linha da célula muda,
+    # independente da ordem; células iguais em versões diferentes do arquivo
+    # têm a mesma impressão digital
+    def calcular(df):
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        grupos = df.groupby(['Unidade', 'Ano'], sort=False, observed=True).indices
+        return {chave: (len(pos), int(hashes[pos].sum())) for chave, pos in grupos.items()}
+    return _por_tabela(_registro_versoes(), df, calcular)
+
+def _indice_selecao(df):
+    """Retorna o índice {(Unidade, Ano, Mês): posições das linhas} da tabela"""
+    return _por_tabela(
+        _registro_indices(), df,
+        lambda df: df.groupby(['Unidade', 'Ano', 'Mês'], sort=False, observed=True).indices
+    )
+
+def _filtrar_por_indice(df, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Filtra a tabela pelas unidades, anos e meses usando o índice pré-calculado"""
+    indice = _indice_selecao(df)
+    partes = [
+        indice[chave]
+        for chave in itertools.product(unidade_selecionada, ano_selecionado, mes_selecionado)
+        if chave in indice
+    ]
+    # Mantém a ordem das linhas da tabela, que já está ordenada por Ano e Mês
+    posicoes = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+    return df.iloc[posicoes]
+
+class _CuboIndicadores:
+    """Somas de cada coluna numérica da tabela por (Unidade, Ano, Mês)"""
+
+    def __init__(self, df):
+        anos = np.unique(df['Ano'].to_numpy())
+        self.unidades = {unidade: i for i, unidade in enumerate(df['Unidade'].cat.categories)}
+        self.anos = {int(ano): i for i, ano in enumerate(anos)}
+        self.meses = {mes: i for i, mes in enumerate(ORDEM_MESES)}
+
+        pos_unidade = df['Unidade'].cat.codes.to_numpy()
+        pos_ano = np.searchsorted(anos, df['Ano'].to_numpy())
+        pos_mes = df['Mês Num'].to_numpy().astype(np.intp) - 1
+        validas = (pos_unidade >= 0) & (pos_mes >= 0)
+        posicoes = (pos_unidade[validas], pos_ano[validas], pos_mes[validas])
+        forma = (len(self.unidades), len(anos), len(ORDEM_MESES))
+
+        # Inteiros somam em int64 e valores em float64, como as somas do pandas;
+        # ausentes contam como zero
+        self.somas = {}
+        numericas = [c for c in df.select_dtypes('number').columns if c not in ('Ano', 'Mês Num', 'Período')]
+        for tipo in (np.int64, np.float64):
+            colunas = [c for c in numericas if (df[c].dtype.kind in 'iu') == (tipo is np.int64)]
+            if not colunas:
+                continue
+            cubo = np.zeros(forma + (len(colunas),), dtype=tipo)
+            np.add.at(cubo, posicoes, np.nan_to_num(df[colunas].to_numpy(dtype=tipo))[validas])
+            self.somas.update({coluna: cubo[..., k] for k, coluna in enumerate(colunas)})
+
+    def somar(self, coluna, unidade_selecionada, ano_selecionado, mes_selecionado):
+        """Soma da coluna na seleção; unidades, anos e meses ausentes valem zero"""
+        cubo = self.somas[coluna]
+        pos_unidade = [self.unidades[u] for u in unidade_selecionada if u in self.unidades]
+        pos_ano = [self.anos[a] for a in ano_selecionado if a in self.anos]
+        pos_mes = [self.meses[m] for m in mes_selecionado if m in self.meses]
+        if not (pos_unidade and pos_ano and pos_mes):
+            return cubo.dtype.type(0)
+        return cubo[np.ix_(pos_unidade, pos_ano, pos_mes)].sum()
+
+def cubo_indicadores(df):
+    """Retorna o cubo de indicadores da tabela, montado uma única vez"""
+    return _por_tabela(_registro_cubos(), df, _CuboIndicadores)
+
+# Planilhas com o detalhamento dos plantões, combinadas em uma tabela de fatos
+TABELAS_PLANTAO = ['Tabela4A', 'Tabela4B', 'Tabela4C', 'Tabela4D', 'Tabela4E']
+
+# Tipos de plantão na ordem dos gráficos; tipos novos nas planilhas entram
+# depois destes, na ordem em que aparecem
+TIPOS_PLANTAO = ['Domingo/Feriado', 'Sábado', 'Noturno', 'Emergencial']
+
+# Colunas das planilhas de plantão: medida, tipo de plantão e segmento, ex.
+# 'Faturamento Líquido Total Consulta Plantão Sábado - Google Novos' ou
+# 'Total Consulta Procedimento Emergencial Plantão'
+_COLUNA_PLANTAO = re.compile(
+    r'^(?P<medida>Total|Faturamento Líquido Total) Consulta '
+    r'(?:Plantão (?P<tipo>.+?)|Procedimento (?P<procedimento>.+?) Plantão)'
+    r'(?:\s+-?\s*(?P<segmento>Google Novos|Google Retornantes|Novos|Retornantes))?$'
+)
+_MEDIDAS_PLANTAO = {'Total': 'consultas', 'Faturamento Líquido Total': 'faturamento'}
+
+class _FatosPlantao:
+    """Tabela longa dos plantões: um valor por (Unidade, Ano, Mês, tipo, segmento, medida)"""
+
+    DIMENSOES = ['unidade', 'ano', 'mes', 'tipo', 'segmento', 'medida']
+
+    def __init__(self, tabelas):
+        unidades = sorted(set().union(*(df['Unidade'].cat.categories for df in tabelas)))
+        anos = sorted(set().union(*(np.unique(df['Ano'].to_numpy()).tolist() for df in tabelas)))
+        # Rótulos de cada dimensão; as colunas guardam só os códigos inteiros
+        self.rotulos = {
+            'unidade': unidades, 'ano': anos, 'mes': list(ORDEM_MESES),
+            'tipo': [], 'segmento': [], 'medida': list(_MEDIDAS_PLANTAO.values()),
+        }
+        self._codigos = {dimensao: {r: i for i, r in enumerate(rotulos)} for dimensao, rotulos in self.rotulos.items()}
+
+        partes = {dimensao: [] for dimensao in self.DIMENSOES + ['valor']}
+        for df in tabelas:
+            colunas = [(c, _COLUNA_PLANTAO.match(c)) for c in df.columns]
+            colunas = [(c, m) for c, m in colunas if m]
+            if not colunas:
+                continue
+            pos_unidade = pd.Categorical(df['Unidade'], categories=unidades).codes
+            pos_ano = np.searchsorted(anos, df['Ano'].to_numpy())
+            pos_mes = df['Mês Num'].to_numpy().astype(np.intp) - 1
+            # Melt de todas as colunas de uma vez: a matriz (linhas x colunas)
+            # vira um vetor, linha a linha, e as chaves repetem por coluna
+            valores = df[[c for c, _ in colunas]].to_numpy(dtype=np.float64)
+            chaves_coluna = np.array([
+                (self._codigo('tipo', m['tipo'] or m['procedimento']),
+                 self._codigo('segmento', m['segmento'] or 'Total'),
+                 self._codigos['medida'][_MEDIDAS_PLANTAO[m['medida']]])
+                for _, m in colunas
+            ]).reshape(-1, 3)
+            validos = ((pos_unidade >= 0) & (pos_mes >= 0))[:, None] & ~np.isnan(valores)
+            linhas, cols = np.nonzero(validos)
+            partes['unidade'].append(pos_unidade[linhas])
+            partes['ano'].append(pos_ano[linhas])
+            partes['mes'].append(pos_mes[linhas])
+            for k, dimensao in enumerate(['tipo', 'segmento', 'medida']):
+                partes[dimensao].append(chaves_coluna[cols, k])
+            partes['valor'].append(valores[linhas, cols])
+
+        # Tipos conhecidos na ordem dos gráficos, depois os novos
+        ordem = [t for t in TIPOS_PLANTAO if t in self._codigos['tipo']]
+        ordem += [t for t in self.rotulos['tipo'] if t not in ordem]
+        recodificar = np.array([ordem.index(t) for t in self.rotulos['tipo']], dtype=np.int8)
+        self.rotulos['tipo'] = ordem
+        self._codigos['tipo'] = {t: i for i, t in enumerate(ordem)}
+
+        self.colunas = {}
+        for dimensao in self.DIMENSOES:
+            vazia = np.zeros(0, dtype=np.int16)
+            codigos = np.concatenate(partes[dimensao]) if partes[dimensao] else vazia
+            self.colunas[dimensao] = codigos.astype(np.int16 if dimensao in ('unidade', 'ano') else np.int8)
+        if len(recodificar):
+            self.colunas['tipo'] = recodificar[self.colunas['tipo']]
+        self.colunas['valor'] = np.concatenate(partes['valor']) if partes['valor'] else np.zeros(0)
+
+    def _codigo(self, dimensao, rotulo):
+        """Código do rótulo na dimensão, criando um novo na primeira ocorrência"""
+        codigos = self._codigos[dimensao]
+        if rotulo not in codigos:
+            codigos[rotulo] = len(codigos)
+            self.rotulos[dimensao].append(rotulo)
+        return codigos[rotulo]
+
+    def _mascara(self, dimensao, rotulos):
+        """Linhas cujo valor na dimensão está entre os rótulos pedidos"""
+        aceitos = np.zeros(len(self.rotulos[dimensao]), dtype=bool)
+        aceitos[[self._codigos[dimensao][r] for r in rotulos if r in self._codigos[dimensao]]] = True
+        return aceitos[self.colunas[dimensao]]
+
+    def reduzir(self, por, unidade_selecionada, ano_selecionado, mes_selecionado, **filtros):
+        """Soma os valores da seleção agrupados pelas dimensões em por
+
+        filtros fixa outras dimensões (ex.: segmento='Total'), com um rótulo
+        ou uma lista. Retorna uma Series indexada pelos rótulos de por, só
+        com os grupos que têm dados, na ordem dos códigos.
+        """
+        mascara = (
+            self._mascara('unidade', unidade_selecionada)
+            & self._mascara('ano', [int(a) for a in ano_selecionado])
+            & self._mascara('mes', mes_selecionado)
+        )
+        for dimensao, rotulos in filtros.items():
+            mascara &= self._mascara(dimensao, rotulos if isinstance(rotulos, list) else [rotulos])
+
+        if not por:
+            return self.colunas['valor'][mascara].sum()
+
+        # Uma única redução agrupada: os códigos das dimensões viram uma
+        # chave inteira e as somas saem de um bincount
+        formas = [len(self.rotulos[dimensao]) for dimensao in por]
+        chave = np.ravel_multi_index([self.colunas[dimensao][mascara] for dimensao in por], formas)
+        somas = np.bincount(chave, weights=self.colunas['valor'][mascara], minlength=int(np.prod(formas)))
+        presentes = np.flatnonzero(np.bincount(chave, minlength=len(somas)))
+        posicoes = np.unravel_index(presentes, formas)
+        niveis = [np.asarray(self.rotulos[dimensao], dtype=object)[pos] for dimensao, pos in zip(por, posicoes)]
+        if len(por) == 1:
+            return pd.Series(somas[presentes], index=pd.Index(niveis[0], name=por[0]))
+        return pd.Series(somas[presentes], index=pd.MultiIndex.from_arrays(niveis, names=por))
+
+@st.cache_resource
+def _registro_fatos():
+    """Tabelas de fatos dos plantões, compartilhadas pelo processo"""
+    return {}
+
+def fatos_plantao(tabelas):
+    """Retorna a tabela de fatos das planilhas de plantão, montada uma única vez"""
+    # A chave combina as cinco planilhas: numa recarga parcial a tabela de
+    # fatos é refeita quando qualquer uma delas muda
+    registro = _registro_fatos()
+    chave = tuple(id(df) for df in tabelas)
+    entrada = registro.get(chave)
+    if entrada is not None and all(ref() is df for ref, df in zip(entrada[0], tabelas)):
+        return entrada[1]
+    fatos = _FatosPlantao(tabelas)
+    registro[chave] = ([weakref.ref(df) for df in tabelas], fatos)
+    for df in tabelas:
+        weakref.finalize(df, registro.pop, chave, None)
+    return fatos
+
+def serie_mensal(somas, *grupo):
+    """Meses e valores do grupo em uma Series de reduzir(..., por=[..., 'mes'])"""
+    try:
+        serie = somas.loc[grupo] if grupo else somas
+    except KeyError:
+        return [], np.zeros(0)
+    return list(serie.index.get_level_values(-1)), serie.to_numpy()
+
+# Perfil de desempenho por rerun, ativado com DASHBOARD_PERFIL=1 ou com
+# ?perfil=1 na URL; com DASHBOARD_PERFIL_LOG cada rerun vira uma linha JSON
+PERFIL_AMBIENTE = os.environ.get('DASHBOARD_PERFIL', '') not in ('', '0')
+ARQUIVO_PERFIL = os.environ.get('DASHBOARD_PERFIL_LOG', '')
+
+# Perfil e métrica em andamento em cada thread
+_contexto_perfil = threading.local()
+
+class PerfilRerun:
+    """Tempos das etapas de um rerun, por métrica"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.data = datetime.now()
+        self.total = None
+        self.selecao = {}
+        # (etapa, métrica ou None, segundos), com o tempo próprio da etapa
+        self.registros = []
+        self._trava = threading.Lock()
+
+    def registrar(self, etapa, metrica, segundos):
+        # As métricas construídas em paralelo registram ao mesmo tempo
+        with self._trava:
+            self.registros.append((etapa, metrica, segundos))
+
+    def concluir(self):
+        self.total = time.perf_counter() - self.inicio
+
+    def por_etapa(self):
+        """Segundos por etapa; 'outros' é o tempo do rerun fora das etapas medidas"""
+        etapas = {}
+        for etapa, _, segundos in self.registros:
+            etapas[etapa] = etapas.get(etapa, 0.0) + segundos
+        etapas['outros'] = max(self.total - sum(etapas.values()), 0.0)
+        return etapas
+
+    def por_metrica(self):
+        """Segundos por métrica e etapa: {métrica: {etapa: segundos}}"""
+        metricas = {}
+        for etapa, metrica, segundos in self.registros:
+            if metrica is not None:
+                tempos = metricas.setdefault(metrica, {})
+                tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+        return metricas
+
+def perfil_atual():
+    """Perfil do rerun em andamento nesta thread, ou None fora do modo de perfil"""
+    return getattr(_contexto_perfil, 'perfil', None)
+
+@contextmanager
+def usar_perfil(perfil, metrica=None):
+    """Associa o perfil (e a métrica em construção) às medições desta thread"""
+    anterior = (perfil_atual(), getattr(_contexto_perfil, 'metrica', None), getattr(_contexto_perfil, 'pilha', None))
+    _contexto_perfil.perfil, _contexto_perfil.metrica, _contexto_perfil.pilha = perfil, metrica, []
+    try:
+        yield perfil
+    finally:
+        _contexto_perfil.perfil, _contexto_perfil.metrica, _contexto_perfil.pilha = anterior
+
+@contextmanager
+def medir_etapa(etapa):
+    """Mede o bloco como uma etapa do rerun; sem perfil ativo não faz nada"""
+    perfil = perfil_atual()
+    if perfil is None:
+        yield
+        return
+    # Etapas aninhadas (o filtro dentro da figura) contam só o tempo próprio:
+    # a soma das etapas de uma thread é o tempo de parede dela
+    pilha = _contexto_perfil.pilha
+    pilha.append(0.0)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        decorrido = time.perf_counter() - inicio
+        filhas = pilha.pop()
+        if pilha:
+            pilha[-1] += decorrido
+        perfil.registrar(etapa, _contexto_perfil.metrica, decorrido - filhas)
+
+class _CacheLRU:
+    """Dicionário com limite de tamanho que descarta o item usado há mais tempo"""
+
+    def __init__(self, tamanho_maximo):
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def buscar(self, chave):
+        """Retorna o valor da chave ou None, marcando-o como usado recentemente"""
+        with self._trava:
+            if chave not in self._itens:
+                return None
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave, valor):
+        """Guarda o valor, descartando os itens mais antigos além do limite"""
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def obter(self, chave, calcular):
+        """Retorna o valor da chave, calculando-o com calcular() se necessário"""
+        valor = self.buscar(chave)
+        if valor is None:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+@st.cache_resource
+def _cache_fatias():
+    """Fatias já filtradas e ordenadas, compartilhadas entre gráficos e sessões"""
+    return _CacheLRU(tamanho_maximo=128)
+
+def filtrar_selecao(df, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Retorna a tabela filtrada pela seleção, já ordenada por Ano e Mês"""
+    # A mesma seleção é pedida por vários gráficos e pelos indicadores no mesmo
+    # rerun: cada tabela é filtrada uma única vez por seleção. A entrada guarda
+    # a própria tabela, então o id(df) da chave não pode ser reaproveitado
+    chave = (id(df), frozenset(unidade_selecionada), frozenset(ano_selecionado), frozenset(mes_selecionado))
+    with medir_etapa('filtro'):
+        _, fatia = _cache_fatias().obter(
+            chave,
+            lambda: (df, _filtrar_por_indice(df, unidade_selecionada, ano_selecionado, mes_selecionado))
+        )
+        # Cópia rasa: quem recebe pode criar colunas sem alterar a fatia em cache
+        return fatia.copy(deep=False)
+
+def series_por_ano(df, ano_selecionado, colunas):
+    """Separa as colunas por ano com um único groupby; retorna [(ano, {coluna: array})]"""
+    # Substitui o filtro df[df['Ano'] == ano] repetido a cada ano (e a cada
+    # laço): os anos vêm em ordem crescente e anos sem dados recebem arrays
+    # vazios, mantendo um trace por ano selecionado
+    posicoes = df.groupby('Ano', sort=False).indices
+    valores = {coluna: df[coluna].to_numpy() for coluna in colunas}
+    vazio = np.array([], dtype=np.intp)
+    return [
+        (ano, {coluna: valor[posicoes.get(ano, vazio)] for coluna, valor in valores.items()})
+        for ano in sorted(ano_selecionado)
+    ]
+
+def somar_por_mes(df, colunas):
+    """Soma as colunas das unidades selecionadas em cada (Ano, Mês), em ordem cronológica"""
+    # Séries mensais sem facetas: um ponto por mês, e não um por unidade. Com
+    # uma unidade cada (Ano, Mês) já tem uma única linha e nada muda
+    return df.groupby(['Ano', 'Mês'], sort=True, observed=True)[colunas].sum().reset_index()
+
+# Ano da primeira cor de cada paleta base (as paletas originais eram 2023 e 2024)
+ANO_REFERENCIA_CORES = 2023
+# Anos fora da paleta base usam posições da escala contínua, repetidas a cada
+# ciclo; o passo afasta as cores de anos consecutivos
+CICLO_CORES_ANO = 8
+PASSO_CORES_ANO = 3
+
+def cores_por_ano(ano_selecionado, cores_base, escala, faixa=(0.9, 0.4)):
+    """Retorna {ano: cor} para os anos selecionados; a cor depende só do ano"""
+    # Um ano mantém a cor quando outros anos entram ou saem da seleção: os
+    # anos cobertos pela paleta base usam as cores dela e os demais uma
+    # posição fixa da escala contínua
+    cores = {}
+    for ano in sorted(ano_selecionado):
+        indice = int(ano) - ANO_REFERENCIA_CORES
+        if 0 <= indice < len(cores_base):
+            cores[ano] = cores_base[indice]
+        else:
+            passo = (indice * PASSO_CORES_ANO) % CICLO_CORES_ANO
+            posicao = faixa[0] + (faixa[1] - faixa[0]) * passo / (CICLO_CORES_ANO - 1)
+            cores[ano] = px.colors.sample_colorscale(escala, [posicao])[0]
+    return cores
+
+@st.cache_resource
+def _ultima_carga():
+    """Última versão de cada arquivo: {caminho: TabelasSobDemanda}"""
+    return {}
+
+def _planejar_carga(caminho):
+    """Identifica as planilhas do arquivo que podem ser reaproveitadas, sem ler nenhuma"""
+    assinaturas, textos = _assinaturas_planilhas(caminho)
+    registro_textos = (len(textos), _resumo_textos(textos, len(textos)))
+
+    # 1. Planilhas inalteradas já carregadas na versão anterior reaproveitam
+    # os mesmos objetos, e com eles índices, cubos e fatias já calculados
+    anteriores = {}
+    anterior = _ultima_carga().get(caminho)
+    if anterior is not None and _textos_preservados(anterior.plano['textos'], textos):
+        for nome, df in anterior.carregadas().items():
+            if assinaturas.get(nome) is not None and anterior.plano['assinaturas'].get(nome) == assinaturas[nome]:
+                anteriores[nome] = df
+
+    # 2. Depois, a cópia colunar gravada por uma execução anterior
+    manifesto = _ler_manifesto(caminho)
+    gravadas = set()
+    if manifesto is not None and _textos_preservados(manifesto['textos'], textos):
+        gravadas = {
+            nome for nome in TABELAS
+            if assinaturas.get(nome) is not None and manifesto['planilhas'].get(nome) == assinaturas[nome]
+        }
+
+    # 3. As demais são lidas do Excel quando forem usadas
+    return {
+        'caminho': caminho,
+        'assinaturas': assinaturas,
+        'textos': registro_textos,
+        'gravadas': gravadas,
+        'anteriores': anteriores,
+    }
+
+def _reaproveitar_planilhas(plano, nomes):
+    """Planilhas pedidas que vêm da versão anterior ou do sidecar; retorna {nome: DataFrame}"""
+    tabelas = {}
+    for nome in nomes:
+        if nome in plano['anteriores']:
+            tabelas[nome] = plano['anteriores'][nome]
+        elif nome in plano['gravadas']:
+            try:
+                tabelas[nome] = _ler_tabela_sidecar(plano['caminho'], nome, plano['assinaturas'][nome])
+            except (OSError, ValueError):
+                plano['gravadas'].discard(nome)
+    return tabelas
+
+def _guardar_lidas(plano, lidas):
+    """Acrescenta ao sidecar as planilhas lidas do Excel; retorna as tabelas a usar"""
+    if not lidas:
+        return lidas
+    plano['gravadas'] = _gravar_sidecar(
+        plano['caminho'], plano['assinaturas'], plano['textos'], lidas, plano['gravadas']
+    )
+    if not TABELAS_COMPARTILHADAS:
+        return lidas
+    # A cópia lida do Excel é trocada pelo arquivo publicado, o mesmo que os
+    # outros processos mapeiam
+    tabelas = {}
+    for nome, df in lidas.items():
+        tabelas[nome] = df
+        if nome in plano['gravadas']:
+            try:
+                tabelas[nome] = _ler_tabela_sidecar(plano['caminho'], nome, plano['assinaturas'][nome])
+            except (OSError, ValueError):
+                pass
+    return tabelas
+
+def _preparar_tabela(df):
+    """Monta na carga o índice de seleção, o cubo de indicadores e as versões da tabela"""
+    _indice_selecao(df)
+    cubo_indicadores(df)
+    _versoes_celulas(df)
+
+class TabelasSobDemanda(Mapping):
+    """Dicionário somente leitura {nome da planilha: DataFrame} de um arquivo Excel
+
+    Cada planilha é lida na primeira vez em que um gráfico ou indicador a usa
+    (da versão anterior, do sidecar ou do Excel) e fica guardada para as
+    demais sessões. Com plano None, todas as tabelas são recebidas prontas.
+    """
+
+    def __init__(self, plano, tabelas=None):
+        self.plano = plano
+        self._tabelas = dict(tabelas or {})
+        # Threads da construção paralela podem pedir planilhas ao mesmo tempo
+        self._trava = threading.Lock()
+
+    def __getitem__(self, nome):
+        df = self._tabelas.get(nome)
+        if df is None:
+            if nome not in TABELAS:
+                raise KeyError(nome)
+            self.antecipar([nome])
+            df = self._tabelas[nome]
+        return df
+
+    def __iter__(self):
+        return iter(TABELAS)
+
+    def __len__(self):
+        return len(TABELAS)
+
+    def carregadas(self):
+        """Tabelas já carregadas, na ordem de TABELAS"""
+        return {nome: self._tabelas[nome] for nome in TABELAS if nome in self._tabelas}
+
+    def faltantes(self, nomes):
+        """Planilhas pedidas que ainda não foram carregadas"""
+        return [nome for nome in TABELAS if nome in nomes and nome not in self._tabelas]
+
+    def antecipar(self, nomes):
+        """Carrega de uma vez as planilhas pedidas, abrindo o Excel no máximo uma vez"""
+        with self._trava:
+            faltantes = self.faltantes(nomes)
+            if not faltantes:
+                return
+            tabelas = _reaproveitar_planilhas(self.plano, faltantes)
+            alteradas = [nome for nome in faltantes if nome not in tabelas]
+            if alteradas and TABELAS_COMPARTILHADAS:
+                # Outro processo pode ter publicado a planilha depois do
+                # planejamento: ela é mapeada em vez de lida de novo do Excel
+                self.plano['gravadas'] |= _publicadas_no_sidecar(
+                    self.plano['caminho'], self.plano['assinaturas'], self.plano['textos']
+                )
+                tabelas.update(_reaproveitar_planilhas(self.plano, alteradas))
+                alteradas = [nome for nome in faltantes if nome not in tabelas]
+            if alteradas:
+                lidas = ler_tabelas(self.plano['caminho'], alteradas)
+                tabelas.update(_guardar_lidas(self.plano, lidas))
+            for df in tabelas.values():
+                _preparar_tabela(df)
+            self._tabelas.update(tabelas)
+
+@st.cache_resource(max_entries=4, show_spinner="Carregando dados do Excel...")
+def _carregar_tabelas(caminho, conteudo_hash):
+    """Cache do processo: uma única cópia das tabelas por versão do arquivo"""
+    # Compartilhado entre todas as sessões; as tabelas não devem ser
+    # alteradas por quem as recebe (os gráficos trabalham sobre cópias filtradas).
+    # Aqui só se identifica o que mudou: cada planilha é lida quando for usada
+    tabelas = TabelasSobDemanda(_planejar_carga(caminho))
+    _ultima_carga()[caminho] = tabelas
+    return tabelas
+
+# Planilha lida pelo dashboard quando não há pasta de planilhas por unidade
+ARQUIVO_EXCEL = 'Análise mês Clientes Comparativo anos.xlsx'
+
+# Intervalo, em segundos, entre as verificações do observador do arquivo
+# Excel; com 0 cada rerun confere o arquivo e recarrega na própria requisição
+INTERVALO_OBSERVADOR = float(os.environ.get('DASHBOARD_INTERVALO_OBSERVADOR', '5'))
+
+@st.cache_resource
+def _versoes_publicadas():
+    """Versão dos dados em uso por arquivo: {caminho: (mtime_ns, tabelas)}"""
+    return {}
+
+def _publicar_versao(caminho, mtime_ns, tabelas):
+    """Troca a versão em uso por uma já pronta (tabelas, índices e figuras padrão)"""
+    # Uma única atribuição no dicionário: quem lê vê a versão anterior
+    # inteira ou a nova inteira, nunca uma mistura das duas
+    _versoes_publicadas()[caminho] = (mtime_ns, tabelas)
+
 def load_data(excel_file):
+    """Tabelas do arquivo Excel como TabelasSobDemanda; None se o arquivo não puder ser aberto
+
+    As planilhas são lidas depois, sob demanda: quem as pede trata os erros de leitura.
+    """
     try:
-        df_tabela1 = pd.read_excel(excel_file, sheet_name='Tabela1', skiprows=2)
-        df_tabela2 = pd.read_excel(excel_file, sheet_name='Tabela2', skiprows=2)
-        df_tabela3 = pd.read_excel(excel_file, sheet_name='Tabela3', skiprows=2)
-        df_tabela4a = pd.read_excel(excel_file, sheet_name='Tabela4A', skiprows=2)
-        df_tabela4b = pd.read_excel(excel_file, sheet_name='Tabela4B', skiprows=2)
-        df_tabela4c = pd.read_excel(excel_file, sheet_name='Tabela4C', skiprows=2)
-        df_tabela4d = pd.read_excel(excel_file, sheet_name='Tabela4D', skiprows=2)
-        df_tabela4e = pd.read_excel(excel_file, sheet_name='Tabela4E', skiprows=2)
-        df_tabela5 = pd.read_excel(excel_file, sheet_name='Tabela5', skiprows=2)
-        df_tabela7 = pd.read_excel(excel_file, sheet_name='Tabela7', skiprows=2)
-        
-        return df_tabela1, df_tabela2, df_tabela3, df_tabela4a, df_tabela4b, df_tabela4c, df_tabela4d, df_tabela4e, df_tabela5, df_tabela7
+        publicada = None
+        if INTERVALO_OBSERVADOR > 0:
+            publicada = _versoes_publicadas().get(os.path.abspath(excel_file))
+        if publicada is not None:
+            # As mudanças no arquivo são recarregadas pelo observador, fora
+            # do caminho da requisição
+            return publicada[1]
+        caminho, mtime_ns, conteudo_hash = _assinatura_arquivo(excel_file)
+        tabelas = _carregar_tabelas(caminho, conteudo_hash)
+        if INTERVALO_OBSERVADOR > 0:
+            _publicar_versao(caminho, mtime_ns, tabelas)
+            iniciar_observador(caminho)
+        return tabelas
     except Exception as e:
         st.error(f'Erro ao carregar dados: {str(e)}')
-        return None, None, None, None, None, None, None, None, None
+        return None
 
-    
-def criar_grafico_perfil_clientes(df3, unidade_selecionada, ano_selecionado, mes_selecionado):
-    """Cria gráfico de Perfil de Clientes"""
-    st.markdown("""
+# Pasta com uma planilha por unidade (mesmo layout de Tabelas); sem ela o
+# dashboard lê o arquivo único de sempre
+PASTA_PLANILHAS = os.environ.get('DASHBOARD_PASTA_PLANILHAS', '')
+
+# Limite de processos usados na leitura das planilhas
+MAX_PROCESSOS_CARGA = 8
+
+@st.cache_resource
+def _pool_processos():
+    """Processos para ler várias planilhas ao mesmo tempo, compartilhados pelo servidor"""
+    # A leitura pelo openpyxl é Python puro e não escala com threads. O modo
+    # 'spawn' evita copiar por fork um servidor com várias threads ativas
+    return ProcessPoolExecutor(
+        max_workers=min(os.cpu_count() or 1, MAX_PROCESSOS_CARGA),
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+@st.cache_resource
+def _registro_catalogo():
+    """Unidades de cada planilha já consultada, por (caminho, mtime, tamanho)"""
+    return {}
+
+def catalogo_unidades(caminhos):
+    """Retorna {unidade: [planilhas com a unidade]} lendo só a coluna Unidade das planilhas novas"""
+    registro = _registro_catalogo()
+    versoes = []
+    for caminho in caminhos:
+        info = os.stat(caminho)
+        versoes.append((caminho, info.st_mtime_ns, info.st_size))
+    faltantes = [versao for versao in versoes if versao not in registro]
+    if faltantes:
+        with st.spinner("Procurando as unidades nas planilhas..."):
+            caminhos = [caminho for caminho, _, _ in faltantes]
+            for versao, unidades in zip(faltantes, _pool_processos().map(unidades_da_planilha, caminhos)):
+                registro[versao] = unidades
+    catalogo = {}
+    for versao in versoes:
+        for unidade in registro[versao]:
+            catalogo.setdefault(unidade, []).append(versao[0])
+    return catalogo
+
+@st.cache_resource(max_entries=4, show_spinner="Carregando as planilhas das unidades...")
+def _carregar_fontes(fontes):
+    """Carrega e combina as planilhas; fontes é uma tupla de (caminho, hash do conteúdo)"""
+    # As planilhas que precisam ser lidas do Excel são processadas ao mesmo
+    # tempo no pool; as demais vêm da memória ou do sidecar de cada arquivo
+    # A combinação precisa de todas as planilhas de cada arquivo, então aqui
+    # a leitura não é feita sob demanda
+    planos = [_planejar_carga(caminho) for caminho, _ in fontes]
+    reaproveitadas = [_reaproveitar_planilhas(plano, TABELAS) for plano in planos]
+    futuros = []
+    for plano, tabelas in zip(planos, reaproveitadas):
+        alteradas = [nome for nome in TABELAS if nome not in tabelas]
+        futuros.append(
+            _pool_processos().submit(ler_tabelas, plano['caminho'], alteradas) if alteradas else None
+        )
+    por_fonte = {}
+    for plano, tabelas, futuro in zip(planos, reaproveitadas, futuros):
+        lidas = futuro.result() if futuro else {}
+        tabelas.update(_guardar_lidas(plano, lidas))
+        _ultima_carga()[plano['caminho']] = TabelasSobDemanda(plano, tabelas)
+        por_fonte[nome_fonte(plano['caminho'])] = tuple(tabelas[nome] for nome in TABELAS)
+    combinadas = concatenar_fontes(por_fonte)
+    for df in combinadas:
+        _preparar_tabela(df)
+    return TabelasSobDemanda(None, dict(zip(TABELAS, combinadas)))
+
+def load_fontes(caminhos):
+    """Carrega só as planilhas pedidas e combina cada Tabela com a coluna Fonte"""
+    try:
+        fontes = tuple(
+            (caminho, _assinatura_arquivo(caminho)[2]) for caminho in sorted(caminhos)
+        )
+        return _carregar_fontes(fontes)
+    except Exception as e:
+        st.error(f'Erro ao carregar dados: {str(e)}')
+        return None
+
+# Explicações exibidas acima de cada gráfico: (tipo de elemento, texto).
+# Ficam fora das funções de gráfico para que figuras em cache continuem
+# sendo exibidas com a explicação correspondente
+EXPLICACOES = {
+    'Perfil de Clientes': ('markdown', """
     <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
         <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
         <p>Este gráfico apresenta o perfil dos pacientes atendidos mensalmente.</p>
@@ -99,137 +1072,8 @@ def criar_grafico_perfil_clientes(df3, unidade_selecionada, ano_selecionado, mes
         </ul>
         <p>Utilize este gráfico para identificar padrões de comportamento e origem dos clientes ao longo dos meses.</p>
     </div>
-    """, unsafe_allow_html=True)
-
-    # Filtra os dados para o gráfico
-    df_filtered = df3[
-        (df3['Unidade'].isin(unidade_selecionada)) &
-        (df3['Ano'].isin(ano_selecionado)) &
-        (df3['Mês'].isin(mes_selecionado))
-    ]
-    
-    ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    df_filtered['Mês'] = pd.Categorical(df_filtered['Mês'], categories=ordem_meses, ordered=True)
-    df_filtered = df_filtered.sort_values(['Ano', 'Mês'])
-    
-    fig = make_subplots(rows=1, cols=1, subplot_titles=["Perfil de Clientes"])
-    categorias = ['Novos', 'Retornantes', 'Google Novos', 'Google Retornantes']
-    cores = px.colors.qualitative.Set1
-    
-    for i, cat in enumerate(categorias):
-        valores = df_filtered[f'Total Consulta Plantão - {cat}']
-        fig.add_trace(
-            go.Bar(
-                x=df_filtered['Mês'],
-                y=valores,
-                name=cat,
-                marker_color=cores[i]
-            )
-        )
-    
-    fig.update_layout(
-        title=f"Perfil de Clientes - {', '.join(unidade_selecionada)}",
-        xaxis_title="Mês",
-        yaxis_title="Total de Clientes",
-        barmode="group",
-        height=500
-    )
-    
-    return fig
-
-
-
-def criar_grafico_consultas(df, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
-    """Cria gráfico baseado no tipo selecionado"""
-    df_filtered = df[
-        (df['Unidade'].isin(unidade_selecionada)) &
-        (df['Ano'].isin(ano_selecionado)) &
-        (df['Mês'].isin(mes_selecionado))
-    ]
-    
-    ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    df_filtered['Mês'] = pd.Categorical(df_filtered['Mês'], categories=ordem_meses, ordered=True)
-    df_filtered = df_filtered.sort_values(['Ano', 'Mês'])
-    
-    if tipo == 'Total Consultas (Dia vs Plantão)':
-        fig = make_subplots(rows=2, cols=1, 
-                          subplot_titles=('Consultas Dia', 'Consultas Plantão'),
-                          vertical_spacing=0.12)
-        
-        cores = px.colors.qualitative.Set1
-        for i, ano in enumerate(sorted(ano_selecionado)):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
-            
-            # Gráfico de Consultas Dia
-            fig.add_trace(
-                go.Scatter(
-                    x=df_ano['Mês'],
-                    y=df_ano['Total Consultas Dia'],
-                    name=f'Dia {ano}',
-                    mode='lines+markers',
-                    line=dict(color=cores[i])
-                ),
-                row=1, col=1
-            )
-            
-            # Gráfico de Consultas Plantão
-            fig.add_trace(
-                go.Scatter(
-                    x=df_ano['Mês'],
-                    y=df_ano['Total Consultas Plantão'],
-                    name=f'Plantão {ano}',
-                    mode='lines+markers',
-                    line=dict(color=cores[i], dash='dash')
-                ),
-                row=2, col=1
-            )
-        
-        fig.update_layout(
-            height=800,
-            showlegend=True,
-            title_text=f"Comparativo: Consultas Dia vs Plantão - {', '.join(unidade_selecionada)}",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
-    elif tipo == 'Evolução Temporal Consultas':
-        fig = go.Figure()
-        
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
-            df_ano['Total Consultas'] = df_ano['Total Consultas Dia'] + df_ano['Total Consultas Plantão']
-            
-            fig.add_trace(go.Scatter(
-                x=df_ano['Mês'],
-                y=df_ano['Total Consultas'],
-                name=f'Total {ano}',
-                mode='lines+markers'
-            ))
-            
-        fig.update_layout(
-            title=f'Evolução do Total de Consultas - {", ".join(unidade_selecionada)}',
-            xaxis_title="Mês",
-            yaxis_title="Total de Consultas",
-            height=400,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
-    elif tipo == 'Comparativo Mensal':
-
-        st.info("""
+    """),
+    'Comparativo Mensal': ('info', """
     **Como interpretar este gráfico:**
 
     Este gráfico apresenta uma análise comparativa mensal das consultas:
@@ -245,98 +1089,8 @@ def criar_grafico_consultas(df, tipo, unidade_selecionada, ano_selecionado, mes_
     • Meses com maior demanda
     • Proporção entre atendimentos dia e plantão
     • Crescimento ou redução em relação ao ano anterior
-    """)
-        
-        # Criar pivot table para comparativo mensal
-        df_pivot = df_filtered.pivot_table(
-            values=['Total Consultas Dia', 'Total Consultas Plantão'],
-            index='Mês',
-            columns='Ano',
-            aggfunc='sum'
-        ).round(2)
-        
-        # Calcular variações percentuais
-        for coluna in ['Total Consultas Dia', 'Total Consultas Plantão']:
-            if len(ano_selecionado) == 2:
-                ano_base, ano_comp = sorted(ano_selecionado)
-                df_pivot[f'Variação % {coluna}'] = (
-                    (df_pivot[(coluna, ano_comp)] - df_pivot[(coluna, ano_base)]) / 
-                    df_pivot[(coluna, ano_base)] * 100
-                ).round(1)
-        
-        fig = go.Figure()
-        
-        # Adicionar barras para cada ano
-        for ano in sorted(ano_selecionado):
-            fig.add_trace(go.Bar(
-                name=f'Dia {ano}',
-                x=df_pivot.index,
-                y=df_pivot[('Total Consultas Dia', ano)],
-                offsetgroup=0
-            ))
-            fig.add_trace(go.Bar(
-                name=f'Plantão {ano}',
-                x=df_pivot.index,
-                y=df_pivot[('Total Consultas Plantão', ano)],
-                offsetgroup=1
-            ))
-        
-        fig.update_layout(
-            title=f'Comparativo Mensal de Consultas - {", ".join(unidade_selecionada)}',
-            xaxis_title="Mês",
-            yaxis_title="Número de Consultas",
-            barmode='group',
-            height=500,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-    
-    else:
-        # Caso default para tipos não reconhecidos
-        fig = go.Figure()
-        fig.update_layout(
-            title="Tipo de gráfico não reconhecido",
-            annotations=[dict(
-                text="Tipo de gráfico não implementado",
-                xref="paper",
-                yref="paper",
-                showarrow=False,
-                font=dict(size=14)
-            )]
-        )
-    
-    return fig
-
-def criar_grafico_clientes(df2, df3, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
-    st.write("Verificando df3:", df3.head())
-
-    # Debug temporário para ver as colunas disponíveis
-    if tipo == 'Perfil de Clientes':
-        st.write("DEBUG - Colunas disponíveis em df3:", df3.columns.tolist())
-        # Remove as linhas de criação do gráfico por enquanto
-        return None
-        
-    df_filtered = df2[
-        (df2['Unidade'].isin(unidade_selecionada)) &
-        (df2['Ano'].isin(ano_selecionado)) &
-        (df2['Mês'].isin(mes_selecionado))
-    ]
-    
-    ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    df_filtered['Mês'] = pd.Categorical(df_filtered['Mês'], categories=ordem_meses, ordered=True)
-    df_filtered = df_filtered.sort_values(['Ano', 'Mês'])
-    
-    fig = None  # Inicializa a figura como None
-    
-    if tipo == 'Novos vs Retornantes':
-
-        st.info("""
+    """),
+    'Novos vs Retornantes': ('info', """
 **Como interpretar este gráfico:**
 
 Esta visualização compara dois grupos importantes de clientes:
@@ -356,35 +1110,453 @@ Use esta análise para:
 • Monitorar taxas de retenção
 • Identificar períodos de maior atração de novos clientes
 • Acompanhar a fidelização da base existente
-""")
-        
-        fig = make_subplots(rows=2, cols=1,
-                          subplot_titles=('Clientes Novos', 'Clientes Retornantes'),
-                          vertical_spacing=0.12)
-        
-        cores = px.colors.qualitative.Set1
-        for i, ano in enumerate(sorted(ano_selecionado)):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
-            
-            # Gráfico de Novos Clientes
-            fig.add_trace(
-                go.Bar(
-                    x=df_ano['Mês'],
-                    y=df_ano['Total Consulta Dia - Novos'],
-                    name=f'Novos {ano}',
-                    marker_color=cores[i]
-                ),
-                row=1, col=1
-            )
-            
-            # Gráfico de Clientes Retornantes
-            fig.add_trace(
-                go.Bar(
-                    x=df_ano['Mês'],
-                    y=df_ano['Total Consulta Dia - Retornantes'],
-                    name=f'Retornantes {ano}',
-                    marker_color=cores[i],
-                    marker_pattern_shape="/"
+"""),
+    'Origem Google': ('info', """
+**Como interpretar este gráfico:**
+
+Esta visualização analisa os clientes captados via Google:
+
+• Gráfico Superior: Google Novos
+  - Mostra novos clientes que encontraram o hospital via Google
+  - Indica efetividade das campanhas digitais
+  - Reflete o resultado dos investimentos em marketing digital
+
+• Gráfico Inferior: Google Retornantes
+  - Apresenta clientes que retornam através do Google
+  - Demonstra a eficácia da presença digital para retenção
+  - Indica fidelização através dos canais digitais
+
+Use esta análise para:
+• Avaliar o ROI das campanhas do Google
+• Identificar períodos de maior conversão digital
+• Ajustar estratégias de marketing online
+• Otimizar investimentos em mídia digital
+"""),
+    'Faturamento por Tipo': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Este gráfico mostra o faturamento total dividido entre Clientes Novos e Retornantes ao longo dos meses.</p>
+            <ul>
+                <li><strong>Eixo X:</strong> Meses do ano.</li>
+                <li><strong>Eixo Y:</strong> Valores de faturamento (em R$).</li>
+                <li><strong>Barras:</strong> Comparação entre anos selecionados e categorias de cliente.</li>
+            </ul>
+            <p>Use este gráfico para analisar o impacto da captação de novos clientes e a fidelização dos clientes existentes.</p>
+        </div>
+        """),
+    'Ticket Médio': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Este gráfico mostra a evolução do ticket médio (valor médio gasto por cliente) ao longo dos meses.</p>
+            <ul>
+                <li><strong>Eixo X:</strong> Meses do ano.</li>
+                <li><strong>Eixo Y:</strong> Ticket médio (em R$).</li>
+                <li><strong>Linha:</strong> Tendência do ticket médio em cada ano selecionado.</li>
+            </ul>
+            <p>Use este gráfico para monitorar o desempenho financeiro médio por cliente.</p>
+        </div>
+        """),
+    'Análise Financeira': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Este gráfico apresenta uma análise financeira detalhada:</p>
+            <ul>
+                <li><strong>Evolução do Faturamento:</strong> Tendência ao longo do tempo.</li>
+                <li><strong>Distribuição por Unidade:</strong> Proporção do faturamento entre unidades.</li>
+                <li><strong>Comparativo Mensal:</strong> Diferença de faturamento entre anos.</li>
+                <li><strong>Tendência de Crescimento:</strong> Média móvel do faturamento.</li>
+            </ul>
+            <p>Use esta análise para identificar padrões e insights financeiros detalhados.</p>
+        </div>
+        """),
+    'Evolução Ticket Plantão': ('markdown', """
+            <div class="graph-explanation" style="background-color: #003366; color: white; padding: 15px; margin-bottom: 15px;">
+                <h4>Como interpretar este gráfico:</h4>
+                <p>Este gráfico apresenta três métricas importantes:</p>
+                <ul>
+                    <li><strong>Ticket Médio Geral (azul):</strong> Valor médio de todas as consultas realizadas</li>
+                    <li><strong>Representatividade (laranja):</strong> Percentual que o plantão representa no faturamento total</li>
+                    <li><strong>Ticket Médio Plantão (rosa):</strong> Valor médio específico dos atendimentos de plantão</li>
+                </ul>
+                <p>A comparação destas métricas permite avaliar o desempenho financeiro dos plantões em relação ao total.</p>
+            </div>
+            """),
+    'Comparativo Ticket Plantão': ('markdown', """
+            <div class="graph-explanation" style="color: white; background-color: #003366; padding: 15px; margin-bottom: 15px;">
+                <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+                <p>Este gráfico compara os tickets médios dos atendimentos de plantão ao longo do tempo.</p>
+            </div>
+            """),
+    'Distribuição Plantão': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Distribuição dos Atendimentos de Plantão</h4>
+            <p>Este gráfico mostra a distribuição dos atendimentos de plantão por tipo:</p>
+            <ul>
+                <li>Domingos e Feriados</li>
+                <li>Sábados</li>
+                <li>Plantão Noturno</li>
+                <li>Emergências</li>
+            </ul>
+        </div>
+        """),
+    'Plantão por Dia': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Esta visualização apresenta uma análise detalhada dos atendimentos de plantão por dia específico:</p>
+            <ul>
+                <li><strong>Gráfico Superior - Domingos e Feriados:</strong>
+                    <ul>
+                        <li>Mostra o volume de atendimentos em plantões aos domingos e feriados</li>
+                        <li>Diferencia entre novos clientes e retornantes</li>
+                        <li>Permite visualizar padrões de demanda em finais de semana/feriados</li>
+                    </ul>
+                </li>
+                <li><strong>Gráfico Inferior - Sábados:</strong>
+                    <ul>
+                        <li>Apresenta o volume de atendimentos em plantões aos sábados</li>
+                        <li>Separa entre novos clientes e retornantes</li>
+                        <li>Identifica a demanda específica dos sábados</li>
+                    </ul>
+                </li>
+            </ul>
+            <p>Use esta análise para:</p>
+            <ul>
+                <li>Otimizar a escala de profissionais nos diferentes dias</li>
+                <li>Identificar períodos de maior demanda</li>
+                <li>Comparar o perfil de atendimento entre sábados e domingos/feriados</li>
+                <li>Planejar recursos específicos para cada tipo de dia</li>
+            </ul>
+        </div>
+        """),
+    'Plantão Emergencial': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Esta visualização analisa os atendimentos noturnos realizados durante o plantão:</p>
+            <ul>
+                <li><strong>Gráfico Superior - Volume de Atendimentos:</strong>
+                    <ul>
+                        <li>Mostra a quantidade de atendimentos noturnos por mês</li>
+                        <li>Permite identificar períodos de maior demanda</li>
+                        <li>Compara volumes entre diferentes anos</li>
+                    </ul>
+                </li>
+                <li><strong>Gráfico Inferior - Faturamento:</strong>
+                    <ul>
+                        <li>Apresenta o faturamento gerado pelos atendimentos noturnos</li>
+                        <li>Permite análise da sazonalidade do faturamento</li>
+                        <li>Compara desempenho financeiro entre períodos</li>
+                    </ul>
+                </li>
+            </ul>
+            <p>Use esta análise para:</p>
+            <ul>
+                <li>Planejar equipes de plantão noturno</li>
+                <li>Identificar períodos que requerem mais recursos</li>
+                <li>Avaliar o impacto financeiro dos atendimentos noturnos</li>
+                <li>Otimizar processos em períodos de alta demanda</li>
+            </ul>
+        </div>
+        """),
+    'Análise Temporal Plantão': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Esta visualização apresenta a evolução temporal dos diferentes tipos de plantão:</p>
+            <ul>
+                <li><strong>Gráfico Superior - Volume de Atendimentos:</strong>
+                    <ul>
+                        <li>Compara o volume de atendimentos entre os diferentes tipos de plantão</li>
+                        <li>Permite identificar tendências ao longo do tempo</li>
+                        <li>Mostra a distribuição entre dias úteis, fins de semana e feriados</li>
+                    </ul>
+                </li>
+                <li><strong>Gráfico Inferior - Faturamento por Tipo:</strong>
+                    <ul>
+                        <li>Apresenta o faturamento discriminado por tipo de plantão</li>
+                        <li>Permite comparar a rentabilidade de cada modalidade</li>
+                        <li>Mostra a evolução do faturamento ao longo do tempo</li>
+                    </ul>
+                </li>
+            </ul>
+            <p>Use esta análise para:</p>
+            <ul>
+                <li>Identificar padrões sazonais nos diferentes tipos de plantão</li>
+                <li>Otimizar a alocação de recursos por período</li>
+                <li>Avaliar o crescimento do serviço de plantão ao longo do tempo</li>
+                <li>Planejar melhorias específicas para cada tipo de atendimento</li>
+            </ul>
+        </div>
+        """),
+    'Comparativo Plantão': ('markdown', """
+        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
+            <p>Este gráfico apresenta uma análise comparativa detalhada dos diferentes tipos de plantão:</p>
+            <ul>
+                <li><strong>Gráfico Superior - Comparativo Mensal:</strong>
+                    <ul>
+                        <li>Compara o volume de atendimentos mês a mês para cada tipo de plantão</li>
+                        <li>Permite visualizar a distribuição dos atendimentos entre diferentes modalidades</li>
+                        <li>Identifica o peso de cada tipo de plantão no total de atendimentos</li>
+                    </ul>
+                </li>
+                <li><strong>Gráfico Inferior - Análise Financeira:</strong>
+                    <ul>
+                        <li>Compara o faturamento entre os diferentes tipos de plantão</li>
+                        <li>Mostra o ticket médio por tipo de plantão</li>
+                        <li>Permite avaliar a performance financeira de cada modalidade</li>
+                    </ul>
+                </li>
+            </ul>
+            <p>Use esta análise para:</p>
+            <ul>
+                <li>Identificar as modalidades de plantão mais demandadas</li>
+                <li>Comparar a eficiência financeira entre os tipos de plantão</li>
+                <li>Planejar a distribuição de recursos entre as modalidades</li>
+                <li>Tomar decisões sobre expansão ou ajuste dos serviços</li>
+            </ul>
+        </div>
+        """),
+}
+
+def exibir_explicacao(metrica):
+    """Exibe a explicação do gráfico da métrica, se houver"""
+    if metrica not in EXPLICACOES:
+        return
+    tipo, texto = EXPLICACOES[metrica]
+    if tipo == 'info':
+        st.info(texto)
+    else:
+        st.markdown(texto, unsafe_allow_html=True)
+
+    
+class GraficoIndisponivel(Exception):
+    """A métrica não pode ser calculada para a seleção; a mensagem é exibida como aviso"""
+
+# As funções criar_grafico_* só calculam: recebem tabelas e seleção e
+# retornam a figura, sem escrever na página. A exibição fica com exibir_grafico
+
+def criar_grafico_perfil_clientes(df3, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Cria gráfico de Perfil de Clientes"""
+
+    # Filtra os dados para o gráfico
+    df_filtered = filtrar_selecao(df3, unidade_selecionada, ano_selecionado, mes_selecionado)
+    
+    fig = make_subplots(rows=1, cols=1, subplot_titles=["Perfil de Clientes"])
+    categorias = ['Novos', 'Retornantes', 'Google Novos', 'Google Retornantes']
+    cores = px.colors.qualitative.Set1
+    por_mes = somar_por_mes(df_filtered, [f'Total Consulta Plantão - {cat}' for cat in categorias])
+    
+    for i, cat in enumerate(categorias):
+        valores = por_mes[f'Total Consulta Plantão - {cat}']
+        fig.add_trace(
+            go.Bar(
+                x=por_mes['Mês'],
+                y=valores,
+                name=cat,
+                marker_color=cores[i]
+            )
+        )
+    
+    fig.update_layout(
+        title=f"Perfil de Clientes - {', '.join(unidade_selecionada)}",
+        xaxis_title="Mês",
+        yaxis_title="Total de Clientes",
+        barmode="group",
+        height=500
+    )
+    
+    return fig
+
+
+
+def criar_grafico_consultas(df, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Cria gráfico baseado no tipo selecionado"""
+    df_filtered = filtrar_selecao(df, unidade_selecionada, ano_selecionado, mes_selecionado)
+    
+    if tipo == 'Total Consultas (Dia vs Plantão)':
+        fig = make_subplots(rows=2, cols=1, 
+                          subplot_titles=('Consultas Dia', 'Consultas Plantão'),
+                          vertical_spacing=0.12)
+        
+        cores = cores_por_ano(ano_selecionado, px.colors.qualitative.Set1, 'Turbo', faixa=(0.05, 0.95))
+        por_mes = somar_por_mes(df_filtered, ['Total Consultas Dia', 'Total Consultas Plantão'])
+        grupos = series_por_ano(
+            por_mes, ano_selecionado,
+            ['Mês', 'Total Consultas Dia', 'Total Consultas Plantão']
+        )
+        for ano, df_ano in grupos:
+            
+            # Gráfico de Consultas Dia
+            fig.add_trace(
+                go.Scatter(
+                    x=df_ano['Mês'],
+                    y=df_ano['Total Consultas Dia'],
+                    name=f'Dia {ano}',
+                    mode='lines+markers',
+                    line=dict(color=cores[ano])
+                ),
+                row=1, col=1
+            )
+            
+            # Gráfico de Consultas Plantão
+            fig.add_trace(
+                go.Scatter(
+                    x=df_ano['Mês'],
+                    y=df_ano['Total Consultas Plantão'],
+                    name=f'Plantão {ano}',
+                    mode='lines+markers',
+                    line=dict(color=cores[ano], dash='dash')
+                ),
+                row=2, col=1
+            )
+        
+        fig.update_layout(
+            height=800,
+            showlegend=True,
+            title_text=f"Comparativo: Consultas Dia vs Plantão - {', '.join(unidade_selecionada)}",
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
+            )
+        )
+        
+    elif tipo == 'Evolução Temporal Consultas':
+        fig = go.Figure()
+        
+        por_mes = somar_por_mes(df_filtered, ['Total Consultas Dia', 'Total Consultas Plantão'])
+        grupos = series_por_ano(
+            por_mes, ano_selecionado,
+            ['Mês', 'Total Consultas Dia', 'Total Consultas Plantão']
+        )
+        for ano, df_ano in grupos:
+            df_ano['Total Consultas'] = df_ano['Total Consultas Dia'] + df_ano['Total Consultas Plantão']
+            
+            fig.add_trace(go.Scatter(
+                x=df_ano['Mês'],
+                y=df_ano['Total Consultas'],
+                name=f'Total {ano}',
+                mode='lines+markers'
+            ))
+            
+        fig.update_layout(
+            title=f'Evolução do Total de Consultas - {", ".join(unidade_selecionada)}',
+            xaxis_title="Mês",
+            yaxis_title="Total de Consultas",
+            height=400,
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
+            )
+        )
+        
+    elif tipo == 'Comparativo Mensal':
+        # Criar pivot table para comparativo mensal
+        df_pivot = df_filtered.pivot_table(
+            values=['Total Consultas Dia', 'Total Consultas Plantão'],
+            index='Mês',
+            columns='Ano',
+            aggfunc='sum'
+        ).round(2)
+        
+        # Calcular variações percentuais
+        for coluna in ['Total Consultas Dia', 'Total Consultas Plantão']:
+            if len(ano_selecionado) == 2:
+                ano_base, ano_comp = sorted(ano_selecionado)
+                df_pivot[f'Variação % {coluna}'] = (
+                    (df_pivot[(coluna, ano_comp)] - df_pivot[(coluna, ano_base)]) / 
+                    df_pivot[(coluna, ano_base)] * 100
+                ).round(1)
+        
+        fig = go.Figure()
+        
+        # Adicionar barras para cada ano
+        for ano in sorted(ano_selecionado):
+            fig.add_trace(go.Bar(
+                name=f'Dia {ano}',
+                x=df_pivot.index,
+                y=df_pivot[('Total Consultas Dia', ano)],
+                offsetgroup=0
+            ))
+            fig.add_trace(go.Bar(
+                name=f'Plantão {ano}',
+                x=df_pivot.index,
+                y=df_pivot[('Total Consultas Plantão', ano)],
+                offsetgroup=1
+            ))
+        
+        fig.update_layout(
+            title=f'Comparativo Mensal de Consultas - {", ".join(unidade_selecionada)}',
+            xaxis_title="Mês",
+            yaxis_title="Número de Consultas",
+            barmode='group',
+            height=500,
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
+            )
+        )
+    
+    else:
+        # Caso default para tipos não reconhecidos
+        fig = go.Figure()
+        fig.update_layout(
+            title="Tipo de gráfico não reconhecido",
+            annotations=[dict(
+                text="Tipo de gráfico não implementado",
+                xref="paper",
+                yref="paper",
+                showarrow=False,
+                font=dict(size=14)
+            )]
+        )
+    
+    return fig
+
+def criar_grafico_clientes(df2, df3, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
+    df_filtered = filtrar_selecao(df2, unidade_selecionada, ano_selecionado, mes_selecionado)
+    
+    fig = None  # Inicializa a figura como None
+    
+    if tipo == 'Novos vs Retornantes':
+        fig = make_subplots(rows=2, cols=1,
+                          subplot_titles=('Clientes Novos', 'Clientes Retornantes'),
+                          vertical_spacing=0.12)
+        
+        cores = cores_por_ano(ano_selecionado, px.colors.qualitative.Set1, 'Turbo', faixa=(0.05, 0.95))
+        por_mes = somar_por_mes(df_filtered, ['Total Consulta Dia - Novos', 'Total Consulta Dia - Retornantes'])
+        grupos = series_por_ano(
+            por_mes, ano_selecionado,
+            ['Mês', 'Total Consulta Dia - Novos', 'Total Consulta Dia - Retornantes']
+        )
+        for ano, df_ano in grupos:
+            
+            # Gráfico de Novos Clientes
+            fig.add_trace(
+                go.Bar(
+                    x=df_ano['Mês'],
+                    y=df_ano['Total Consulta Dia - Novos'],
+                    name=f'Novos {ano}',
+                    marker_color=cores[ano]
+                ),
+                row=1, col=1
+            )
+            
+            # Gráfico de Clientes Retornantes
+            fig.add_trace(
+                go.Bar(
+                    x=df_ano['Mês'],
+                    y=df_ano['Total Consulta Dia - Retornantes'],
+                    name=f'Retornantes {ano}',
+                    marker_color=cores[ano],
+                    marker_pattern_shape="/"
                 ),
                 row=2, col=1
             )
@@ -407,35 +1579,19 @@ Use esta análise para:
         fig.update_yaxes(title_text="Número de Clientes", row=2, col=1)
         
     elif tipo == 'Origem Google':
-        st.info("""
-**Como interpretar este gráfico:**
-
-Esta visualização analisa os clientes captados via Google:
-
-• Gráfico Superior: Google Novos
-  - Mostra novos clientes que encontraram o hospital via Google
-  - Indica efetividade das campanhas digitais
-  - Reflete o resultado dos investimentos em marketing digital
-
-• Gráfico Inferior: Google Retornantes
-  - Apresenta clientes que retornam através do Google
-  - Demonstra a eficácia da presença digital para retenção
-  - Indica fidelização através dos canais digitais
-
-Use esta análise para:
-• Avaliar o ROI das campanhas do Google
-• Identificar períodos de maior conversão digital
-• Ajustar estratégias de marketing online
-• Otimizar investimentos em mídia digital
-""")
-        
         fig = make_subplots(rows=2, cols=1,
                         subplot_titles=('Clientes Google Novos', 'Clientes Google Retornantes'),
                         vertical_spacing=0.12)
         
-        cores = px.colors.qualitative.Set1
-        for i, ano in enumerate(sorted(ano_selecionado)):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
+        cores = cores_por_ano(ano_selecionado, px.colors.qualitative.Set1, 'Turbo', faixa=(0.05, 0.95))
+        por_mes = somar_por_mes(
+            df_filtered, ['Total Consultas Dia - Google Novos', 'Total Consulta Dia - Google Retornantes']
+        )
+        grupos = series_por_ano(
+            por_mes, ano_selecionado,
+            ['Mês', 'Total Consultas Dia - Google Novos', 'Total Consulta Dia - Google Retornantes']
+        )
+        for ano, df_ano in grupos:
             
             # Gráfico de Google Novos
             fig.add_trace(
@@ -443,7 +1599,7 @@ Use esta análise para:
                     x=df_ano['Mês'],
                     y=df_ano['Total Consultas Dia - Google Novos'],
                     name=f'Google Novos {ano}',
-                    marker_color=cores[i]
+                    marker_color=cores[ano]
                 ),
                 row=1, col=1
             )
@@ -454,7 +1610,7 @@ Use esta análise para:
                     x=df_ano['Mês'],
                     y=df_ano['Total Consulta Dia - Google Retornantes'],
                     name=f'Google Retornantes {ano}',
-                    marker_color=cores[i],
+                    marker_color=cores[ano],
                     marker_pattern_shape="/"
                 ),
                 row=2, col=1
@@ -476,64 +1632,6 @@ Use esta análise para:
         fig.update_xaxes(title_text="Mês", row=2, col=1)
         fig.update_yaxes(title_text="Número de Clientes", row=1, col=1)
         fig.update_yaxes(title_text="Número de Clientes", row=2, col=1)
-        
-    elif tipo == 'Perfil de Clientes':
-        # Filtra dados do df3
-        df_filtered_3 = df3[
-            (df3['Unidade'].isin(unidade_selecionada)) &
-            (df3['Ano'].isin(ano_selecionado)) &
-            (df3['Mês'].isin(mes_selecionado))
-        ]
-        df_filtered_3['Mês'] = pd.Categorical(df_filtered_3['Mês'], categories=ordem_meses, ordered=True)
-        df_filtered_3 = df_filtered_3.sort_values(['Ano', 'Mês'])
-        
-        # Mostra as colunas disponíveis
-        st.write("Colunas disponíveis em df3:", df3.columns.tolist())
-        
-        # Continua com um gráfico simples para não quebrar
-        fig = go.Figure()
-        fig.update_layout(
-            title="Debug - Verificando colunas disponíveis",
-            height=400
-        )
-        
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered_3[df_filtered_3['Ano'] == ano]
-            
-            fig.add_trace(go.Bar(
-                x=df_ano['Mês'],
-                y=df_ano['Total Cães'],
-                name=f'Cães {ano}',
-                marker_color='blue'
-            ))
-            fig.add_trace(go.Bar(
-                x=df_ano['Mês'],
-                y=df_ano['Total Gatos'],
-                name=f'Gatos {ano}',
-                marker_color='orange'
-            ))
-            fig.add_trace(go.Bar(
-                x=df_ano['Mês'],
-                y=df_ano['Total Outros'],
-                name=f'Outros {ano}',
-                marker_color='green'
-            ))
-            
-        fig.update_layout(
-            barmode='group',
-            title=f'Perfil dos Pacientes por Mês - {", ".join(unidade_selecionada)}',
-            xaxis_title="Mês",
-            yaxis_title="Número de Pacientes",
-            height=400,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
     return fig
 
 def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
@@ -541,41 +1639,22 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
     fig = None
     
     # Filtrando os dados
-    df_filtered = df5[
-        (df5['Unidade'].isin(unidade_selecionada)) &
-        (df5['Ano'].isin(ano_selecionado)) &
-        (df5['Mês'].isin(mes_selecionado))
-    ]
-    
-    ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    df_filtered['Mês'] = pd.Categorical(df_filtered['Mês'], categories=ordem_meses, ordered=True)
-    df_filtered = df_filtered.sort_values(['Ano', 'Mês'])
+    df_filtered = filtrar_selecao(df5, unidade_selecionada, ano_selecionado, mes_selecionado)
 
-    # Adicionando explicações sem alterar a lógica dos gráficos
     if tipo == 'Faturamento por Tipo':
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Este gráfico mostra o faturamento total dividido entre Clientes Novos e Retornantes ao longo dos meses.</p>
-            <ul>
-                <li><strong>Eixo X:</strong> Meses do ano.</li>
-                <li><strong>Eixo Y:</strong> Valores de faturamento (em R$).</li>
-                <li><strong>Barras:</strong> Comparação entre anos selecionados e categorias de cliente.</li>
-            </ul>
-            <p>Use este gráfico para analisar o impacto da captação de novos clientes e a fidelização dos clientes existentes.</p>
-        </div>
-        """, unsafe_allow_html=True)
-
         fig = go.Figure()
         cores = {
-            'Faturamento Clientes Novos': {2023: '#1f77b4', 2024: '#17becf'},      # Azul escuro e azul claro
-            'Faturamento Clientes Retornantes': {2023: '#ff7f0e', 2024: '#ffa07a'}  # Laranja e laranja claro
+            'Faturamento Clientes Novos': cores_por_ano(ano_selecionado, ['#1f77b4', '#17becf'], 'Blues'),      # Azul escuro e azul claro
+            'Faturamento Clientes Retornantes': cores_por_ano(ano_selecionado, ['#ff7f0e', '#ffa07a'], 'Oranges')  # Laranja e laranja claro
         }
         
+        por_mes = somar_por_mes(df_filtered, ['Faturamento Clientes Novos', 'Faturamento Clientes Retornantes'])
+        grupos = series_por_ano(
+            por_mes, ano_selecionado,
+            ['Mês', 'Faturamento Clientes Novos', 'Faturamento Clientes Retornantes']
+        )
         for categoria in ['Faturamento Clientes Novos', 'Faturamento Clientes Retornantes']:
-            for ano in sorted(ano_selecionado):
-                df_ano = df_filtered[df_filtered['Ano'] == ano]
+            for ano, df_ano in grupos:
                 fig.add_trace(go.Bar(
                     x=df_ano['Mês'],
                     y=df_ano[categoria],
@@ -600,27 +1679,16 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
 
         
     elif tipo == 'Ticket Médio':
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Este gráfico mostra a evolução do ticket médio (valor médio gasto por cliente) ao longo dos meses.</p>
-            <ul>
-                <li><strong>Eixo X:</strong> Meses do ano.</li>
-                <li><strong>Eixo Y:</strong> Ticket médio (em R$).</li>
-                <li><strong>Linha:</strong> Tendência do ticket médio em cada ano selecionado.</li>
-            </ul>
-            <p>Use este gráfico para monitorar o desempenho financeiro médio por cliente.</p>
-        </div>
-        """, unsafe_allow_html=True)
-
         # Código existente para o gráfico
         fig = go.Figure()
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
-            if 'Faturamento Total' in df_ano.columns and 'Total Clientes' in df_ano.columns:
-                df_ano['Ticket Médio'] = df_ano['Faturamento Total'] / df_ano['Total Clientes'].replace(0, np.nan)
-            else:
-                df_ano['Ticket Médio'] = 0
+        # O ticket é recalculado sobre as somas das unidades em cada mês
+        if 'Faturamento Total' in df_filtered.columns and 'Total Clientes' in df_filtered.columns:
+            por_mes = somar_por_mes(df_filtered, ['Faturamento Total', 'Total Clientes'])
+            por_mes['Ticket Médio'] = por_mes['Faturamento Total'] / por_mes['Total Clientes'].replace(0, np.nan)
+        else:
+            por_mes = somar_por_mes(df_filtered, [])
+            por_mes['Ticket Médio'] = 0
+        for ano, df_ano in series_por_ano(por_mes, ano_selecionado, ['Mês', 'Ticket Médio']):
             
             fig.add_trace(go.Scatter(
                 x=df_ano['Mês'],
@@ -645,20 +1713,6 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
         )
         
     elif tipo == 'Análise Financeira':
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Este gráfico apresenta uma análise financeira detalhada:</p>
-            <ul>
-                <li><strong>Evolução do Faturamento:</strong> Tendência ao longo do tempo.</li>
-                <li><strong>Distribuição por Unidade:</strong> Proporção do faturamento entre unidades.</li>
-                <li><strong>Comparativo Mensal:</strong> Diferença de faturamento entre anos.</li>
-                <li><strong>Tendência de Crescimento:</strong> Média móvel do faturamento.</li>
-            </ul>
-            <p>Use esta análise para identificar padrões e insights financeiros detalhados.</p>
-        </div>
-        """, unsafe_allow_html=True)
-
         # Nova implementação para Análise Financeira
         fig = make_subplots(
             rows=2, cols=2,
@@ -672,9 +1726,13 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
                   [{"type": "bar"}, {"type": "scatter"}]]
         )
         
+        # As unidades selecionadas são somadas em cada mês; um único
+        # agrupamento por ano alimenta as linhas e as barras
+        por_mes = somar_por_mes(df_filtered, ['Faturamento Total'])
+        grupos = series_por_ano(por_mes, ano_selecionado, ['Mês', 'Faturamento Total'])
+
         # 1. Evolução do Faturamento (linha)
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
+        for ano, df_ano in grupos:
             fig.add_trace(
                 go.Scatter(
                     x=df_ano['Mês'],
@@ -686,7 +1744,7 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
             )
         
         # 2. Distribuição por Unidade (pizza)
-        fat_por_unidade = df_filtered.groupby('Unidade')['Faturamento Total'].sum()
+        fat_por_unidade = df_filtered.groupby('Unidade', observed=True)['Faturamento Total'].sum()
         fig.add_trace(
             go.Pie(
                 labels=fat_por_unidade.index,
@@ -697,8 +1755,7 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
         )
         
         # 3. Comparativo Mensal (barras)
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
+        for ano, df_ano in grupos:
             fig.add_trace(
                 go.Bar(
                     x=df_ano['Mês'],
@@ -708,14 +1765,14 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
                 row=2, col=1
             )
         
-        # 4. Tendência de Crescimento (linha com média móvel)
-        df_tendencia = df_filtered.sort_values(['Ano', 'Mês'])
-        df_tendencia['Media_Movel'] = df_tendencia['Faturamento Total'].rolling(window=3).mean()
+        # 4. Tendência de Crescimento (linha com média móvel); a média
+        # percorre os meses em ordem cronológica, não as unidades
+        media_movel = por_mes['Faturamento Total'].rolling(window=3).mean()
         
         fig.add_trace(
             go.Scatter(
-                x=df_tendencia['Mês'],
-                y=df_tendencia['Media_Movel'],
+                x=por_mes['Mês'],
+                y=media_movel,
                 name='Tendência (MM-3)',
                 line=dict(dash='dash')
             ),
@@ -782,8 +1839,7 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
     elif tipo == 'Tendência Anual':
         df_filtered['Faturamento Acumulado'] = df_filtered['Faturamento Total'].cumsum()
         fig = go.Figure()
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
+        for ano, df_ano in series_por_ano(df_filtered, ano_selecionado, ['Mês', 'Faturamento Acumulado']):
             fig.add_trace(go.Scatter(
                 x=df_ano['Mês'],
                 y=df_ano['Faturamento Acumulado'],
@@ -804,356 +1860,242 @@ def criar_grafico_faturamento(df5, df3, tipo, unidade_selecionada, ano_seleciona
             height=400
         )
 
-    elif tipo == 'Faturamento por Unidade':
-        unidade_faturamento = df_filtered.groupby('Unidade')['Faturamento Total'].sum().reset_index()
-        fig = px.bar(
-            unidade_faturamento,
-            x='Unidade',
-            y='Faturamento Total',
-            title="Faturamento por Unidade",
-            text='Faturamento Total',
-            color='Unidade'
-        )
-        fig.update_layout(
-            xaxis_title="Unidade",
-            yaxis_title="Faturamento Total (R$)",
-            height=400
-        )
-    
-    
-    return fig
-
-def criar_grafico_ticket_plantao(df7, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
-    """Cria gráficos relacionados ao ticket médio de plantão"""
-    fig = None  # Inicializa a figura como None
-
-    try:
-        # Filtrando os dados
-        df_filtrado = df7[
-            (df7['Unidade'].isin(unidade_selecionada)) & 
-            (df7['Ano'].isin(ano_selecionado)) & 
-            (df7['Mês'].isin(mes_selecionado))
-        ]
-
-        if tipo == 'Evolução Ticket Plantão':
-            st.markdown("""
-            <div class="graph-explanation" style="background-color: #003366; color: white; padding: 15px; margin-bottom: 15px;">
-                <h4>Como interpretar este gráfico:</h4>
-                <p>Este gráfico apresenta três métricas importantes:</p>
-                <ul>
-                    <li><strong>Ticket Médio Geral (azul):</strong> Valor médio de todas as consultas realizadas</li>
-                    <li><strong>Representatividade (laranja):</strong> Percentual que o plantão representa no faturamento total</li>
-                    <li><strong>Ticket Médio Plantão (rosa):</strong> Valor médio específico dos atendimentos de plantão</li>
-                </ul>
-                <p>A comparação destas métricas permite avaliar o desempenho financeiro dos plantões em relação ao total.</p>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Definição das cores para cada tipo de ticket e ano
-            cores = {
-                'Plantão': {
-                    2023: '#1f77b4',  # Azul escuro
-                    2024: '#17becf'   # Azul claro
-                },
-                'Geral': {
-                    2023: '#ff7f0e',  # Laranja escuro
-                    2024: '#ffbb78'   # Laranja claro
-                }
-            }
-
-            # Cria a figura
-            fig = go.Figure()
-            
-            # Verifica se há dados para plotar
-            if not df_filtrado.empty:
-                ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-                df_filtrado['Mês'] = pd.Categorical(df_filtrado['Mês'], categories=ordem_meses, ordered=True)
-                df_filtrado = df_filtrado.sort_values(['Ano', 'Mês'])
-
-                for ano in sorted(ano_selecionado):
-                    df_ano = df_filtrado[df_filtrado['Ano'] == ano]
-                    
-                    if not df_ano.empty:
-                        # Usando o nome correto da coluna
-                        if 'Ticket Médio de Atendimento de Plantão' in df_ano.columns:
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=df_ano['Mês'],
-                                    y=df_ano['Ticket Médio de Atendimento de Plantão'],
-                                    name=f'Ticket Plantão {ano}',
-                                    mode='lines+markers',
-                                    line=dict(color=cores['Plantão'][ano])
-                                )
-                            )
-                        
-                        # Usando os cálculos para o ticket médio geral
-                        df_ano['Ticket Médio Geral'] = df_ano['Faturamento Total Líquido Hospital'] / df_ano['Total Consultas Plantão']
-                        fig.add_trace(
-                            go.Scatter(
-                                x=df_ano['Mês'],
-                                y=df_ano['Ticket Médio Geral'],
-                                name=f'Ticket Geral {ano}',
-                                mode='lines+markers',
-                                line=dict(
-                                    color=cores['Geral'][ano],
-                                    dash='dash'
-                                )
-                            )
-                        )
-
-            # Atualiza o layout
-            fig.update_layout(
-                title="Evolução do Ticket Médio de Plantão",
-                xaxis_title="Mês",
-                yaxis_title="Ticket Médio (R$)",
-                height=400,
-                yaxis=dict(tickformat="R$,.2f"),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
-            )
-
-            # Se não há dados, adiciona anotação informativa
-            if not fig.data:
-                fig.add_annotation(
-                    text="Não há dados disponíveis para o período selecionado",
-                    xref="paper",
-                    yref="paper",
-                    x=0.5,
-                    y=0.5,
-                    showarrow=False,
-                    font=dict(size=14)
-                )
+    elif tipo == 'Faturamento por Unidade':
+        unidade_faturamento = df_filtered.groupby('Unidade', observed=True)['Faturamento Total'].sum().reset_index()
+        fig = px.bar(
+            unidade_faturamento,
+            x='Unidade',
+            y='Faturamento Total',
+            title="Faturamento por Unidade",
+            text='Faturamento Total',
+            color='Unidade'
+        )
+        fig.update_layout(
+            xaxis_title="Unidade",
+            yaxis_title="Faturamento Total (R$)",
+            height=400
+        )
+    
+    
+    return fig
 
-                
+def criar_grafico_ticket_plantao(df7, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Cria gráficos relacionados ao ticket médio de plantão"""
+    fig = None  # Inicializa a figura como None
 
-        if tipo == 'Comparativo Ticket Plantão':
-            st.markdown("""
-            <div class="graph-explanation" style="color: white; background-color: #003366; padding: 15px; margin-bottom: 15px;">
-                <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-                <p>Este gráfico compara os tickets médios dos atendimentos de plantão ao longo do tempo.</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            if not df_filtrado.empty:
-                fig = make_subplots(
-                    rows=2, cols=1,
-                    subplot_titles=('Ticket Médio de Plantão por Unidade', 'Evolução Mensal do Ticket Médio'),
-                    vertical_spacing=0.2
-                )
+    # Filtrando os dados
+    df_filtrado = filtrar_selecao(df7, unidade_selecionada, ano_selecionado, mes_selecionado)
 
-                  # Gráfico superior - Comparação por tipo de plantão
-                # Gráfico superior - Análise do Ticket Médio e Representatividade
-                anos = sorted(ano_selecionado)
-                ticket_values = []
-                rep_values = []
-                
-                for ano in anos:
-                    df_ano = df_filtrado[df_filtrado['Ano'] == ano]
-                    if not df_ano.empty:
-                        # Calcula médias do período
-                        ticket_medio = df_ano['Faturamento Total Líquido de Serviços de Plantão'].sum() / df_ano['Total Consultas Plantão'].sum()
-                        # Calcula a representatividade
-                        fat_plantao = df_ano['Faturamento Total Líquido de Serviços de Plantão'].sum()
-                        fat_total = df_ano['Faturamento Total Líquido Hospital'].sum()
-                        representatividade = (fat_plantao / fat_total * 100) if fat_total > 0 else 0
-                        
-                        # Debug para verificar valores
-                        st.write(f"Debug - Representatividade para {ano}: {representatividade:.1f}%")
-                        
-                        ticket_values.append(ticket_medio)
-                        rep_values.append(representatividade)
-                
-                # Adiciona barras para o ticket médio
-                fig.add_trace(
-                    go.Bar(
-                        x=anos,
-                        y=ticket_values,
-                        text=[f'R$ {val:,.2f}' for val in ticket_values],
-                        textposition='auto',
-                        name='Ticket Médio',
-                        marker_color='#1f77b4',
-                        offsetgroup=0
-                    ),
-                    row=1, col=1
-                )
-                
-                # Adiciona linha de representatividade
-                fig.add_trace(
-                    go.Scatter(
-                        x=anos,
-                        y=rep_values,
-                        text=[f'{val:.1f}%' for val in rep_values],
-                        mode='lines+markers+text',
-                        name='Representatividade (%)',
-                        yaxis='y2',
-                        marker_color='#ff7f0e',
-                        textposition='top center'
-                    ),
-                    row=1, col=1
-                )   
-
-                # Gráfico inferior - Evolução temporal
-                cores = {
-                    'ticket_geral_2023': '#2ca02c',  # Verde para ticket médio geral 2023
-                    'ticket_geral_2024': '#1f77b4',  # Azul para ticket médio geral 2024
-                    'ticket_plantao_2023': '#e377c2',  # Rosa para ticket plantão 2023
-                    'ticket_plantao_2024': '#d62728'   # Vermelho para ticket plantão 2024
-                }
+    if tipo == 'Evolução Ticket Plantão':
+        # Definição das cores para cada tipo de ticket e ano
+        cores = {
+            'Plantão': cores_por_ano(ano_selecionado, ['#1f77b4', '#17becf'], 'Blues'),  # Azul escuro e azul claro
+            'Geral': cores_por_ano(ano_selecionado, ['#ff7f0e', '#ffbb78'], 'Oranges')   # Laranja escuro e laranja claro
+        }
+
+        # Cria a figura
+        fig = go.Figure()
+        
+        # Verifica se há dados para plotar
+        if not df_filtrado.empty:
+            # As unidades selecionadas são somadas em cada mês e os tickets
+            # recalculados sobre as somas, para todos os anos de uma vez
+            somadas = [
+                coluna for coluna in [
+                    'Faturamento Total Líquido de Serviços de Plantão',
+                    'Faturamento Total Líquido Hospital',
+                    'Total Consultas Plantão'
+                ]
+                if coluna in df_filtrado.columns
+            ]
+            por_mes = somar_por_mes(df_filtrado, somadas)
+            consultas = por_mes['Total Consultas Plantão'].replace(0, np.nan)
+            if 'Faturamento Total Líquido de Serviços de Plantão' in por_mes:
+                por_mes['Ticket Médio de Atendimento de Plantão'] = por_mes['Faturamento Total Líquido de Serviços de Plantão'] / consultas
+            por_mes['Ticket Médio Geral'] = por_mes['Faturamento Total Líquido Hospital'] / consultas
+            colunas = [
+                coluna for coluna in ['Mês', 'Ticket Médio de Atendimento de Plantão', 'Ticket Médio Geral']
+                if coluna in por_mes.columns
+            ]
+            for ano, df_ano in series_por_ano(por_mes, ano_selecionado, colunas):
                 
-                ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-                df_filtrado['Mês'] = pd.Categorical(df_filtrado['Mês'], categories=ordem_meses, ordered=True)
-                df_filtrado = df_filtrado.sort_values(['Ano', 'Mês'])
-
-                 # Adiciona as linhas para cada ano
-                for ano in sorted(ano_selecionado):
-                    df_ano = df_filtrado[df_filtrado['Ano'] == ano]
-                    if not df_ano.empty:
-                        # Linha do ticket médio geral
-                        ticket_medio_geral = df_ano['Faturamento Total Líquido Hospital'] / df_ano['Total Consultas Plantão']
-                        fig.add_trace(
-                            go.Scatter(
-                                x=df_ano['Mês'],
-                                y=ticket_medio_geral,
-                                name=f'Ticket Médio Geral {ano}',
-                                mode='lines+markers',
-                                line=dict(
-                                    color=cores[f'ticket_geral_{ano}'], 
-                                    dash='dot'
-                                ),
-                                marker=dict(size=8)
-                            ),
-                            row=2, col=1
-                        )
-                        
-                        # Linha do ticket médio plantão
+                if len(df_ano['Mês']) > 0:
+                    # Usando o nome correto da coluna
+                    if 'Ticket Médio de Atendimento de Plantão' in df_ano:
                         fig.add_trace(
                             go.Scatter(
                                 x=df_ano['Mês'],
                                 y=df_ano['Ticket Médio de Atendimento de Plantão'],
                                 name=f'Ticket Plantão {ano}',
                                 mode='lines+markers',
-                                line=dict(
-                                    color=cores[f'ticket_plantao_{ano}']
-                                ),
-                                marker=dict(size=8)
-                            ),
-                            row=2, col=1
+                                line=dict(color=cores['Plantão'][ano])
+                            )
+                        )
+                    
+                    # Usando os cálculos para o ticket médio geral
+                    fig.add_trace(
+                        go.Scatter(
+                            x=df_ano['Mês'],
+                            y=df_ano['Ticket Médio Geral'],
+                            name=f'Ticket Geral {ano}',
+                            mode='lines+markers',
+                            line=dict(
+                                color=cores['Geral'][ano],
+                                dash='dash'
+                            )
                         )
-
-                # Atualiza o layout
-                fig.update_layout(
-                    height=800,
-                    showlegend=True,
-                    title_text=f"Análise do Ticket Médio de Plantão - {', '.join(unidade_selecionada)}",
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=-0.2,
-                        xanchor="center",
-                        x=0.5
                     )
-                )
-                
-                # Atualiza formatação dos eixos
-                fig.update_yaxes(
-                    title_text="Ticket Médio (R$)", 
-                    tickformat="R$,.2f",
-                    row=1, col=1
-                )
-                fig.update_yaxes(
-                    title_text="Ticket Médio (R$)", 
-                    tickformat="R$,.2f",
-                    row=2, col=1
-                )
-                fig.update_xaxes(title_text="Unidade", row=1, col=1)
-                fig.update_xaxes(title_text="Mês", row=2, col=1)
 
-        if tipo == 'Impacto no Faturamento':
-            # Primeiro verifica se o dataframe está vazio
-            if df_filtrado.empty:
-                st.warning("Não há dados disponíveis para o período selecionado.")
-                return None
-                
-            # Verifica se todas as colunas necessárias existem
-            colunas_necessarias = [
-                'Faturamento Total Líquido de Serviços de Plantão',
-                'Total Consultas Plantão',
-                'Faturamento Total Líquido Hospital'
-            ]
+        # Atualiza o layout
+        fig.update_layout(
+            title="Evolução do Ticket Médio de Plantão",
+            xaxis_title="Mês",
+            yaxis_title="Ticket Médio (R$)",
+            height=400,
+            yaxis=dict(tickformat="R$,.2f"),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
+            )
+        )
+
+        # Se não há dados, adiciona anotação informativa
+        if not fig.data:
+            fig.add_annotation(
+                text="Não há dados disponíveis para o período selecionado",
+                xref="paper",
+                yref="paper",
+                x=0.5,
+                y=0.5,
+                showarrow=False,
+                font=dict(size=14)
+            )
+
             
-            if not all(coluna in df_filtrado.columns for coluna in colunas_necessarias):
-                st.warning("Algumas colunas necessárias não estão disponíveis para análise de impacto no faturamento.")
-                return None
-                
-            # Cria os subplots
+
+    if tipo == 'Comparativo Ticket Plantão':
+        if not df_filtrado.empty:
             fig = make_subplots(
-                rows=2, cols=2,
-                specs=[[{"type": "indicator"}, {"type": "indicator"}],
-                      [{"type": "pie", "colspan": 2}, None]],
-                subplot_titles=('Ticket Médio Plantão', 'Representatividade', 'Distribuição do Faturamento')
+                rows=2, cols=1,
+                subplot_titles=('Ticket Médio de Plantão por Unidade', 'Evolução Mensal do Ticket Médio'),
+                vertical_spacing=0.2
             )
 
-            # Calcula o ticket médio do plantão
-            ticket_medio_plantao = (df_filtrado['Faturamento Total Líquido de Serviços de Plantão'].sum() / 
-                                  df_filtrado['Total Consultas Plantão'].sum())
+              # Gráfico superior - Comparação por tipo de plantão
+            # Gráfico superior - Análise do Ticket Médio e Representatividade
+            anos = sorted(ano_selecionado)
+            ticket_values = []
+            rep_values = []
+
+            # As unidades selecionadas são somadas em cada mês e os tickets
+            # recalculados sobre as somas; um único agrupamento por ano
+            # alimenta os dois gráficos
+            por_mes = somar_por_mes(df_filtrado, [
+                'Faturamento Total Líquido de Serviços de Plantão',
+                'Faturamento Total Líquido Hospital',
+                'Total Consultas Plantão'
+            ])
+            consultas = por_mes['Total Consultas Plantão'].replace(0, np.nan)
+            por_mes['Ticket Médio de Atendimento de Plantão'] = por_mes['Faturamento Total Líquido de Serviços de Plantão'] / consultas
+            por_mes['Ticket Médio Geral'] = por_mes['Faturamento Total Líquido Hospital'] / consultas
+            grupos = series_por_ano(por_mes, anos, [
+                'Mês',
+                'Faturamento Total Líquido de Serviços de Plantão',
+                'Faturamento Total Líquido Hospital',
+                'Total Consultas Plantão',
+                'Ticket Médio de Atendimento de Plantão',
+                'Ticket Médio Geral'
+            ])
             
-            # Calcula o ticket médio geral
-            ticket_medio_geral = (df_filtrado['Faturamento Total Líquido Hospital'].sum() / 
-                                df_filtrado['Total Consultas Plantão'].sum())
+            for ano, df_ano in grupos:
+                if len(df_ano['Mês']) > 0:
+                    # Calcula médias do período
+                    ticket_medio = df_ano['Faturamento Total Líquido de Serviços de Plantão'].sum() / df_ano['Total Consultas Plantão'].sum()
+                    # Calcula a representatividade
+                    fat_plantao = df_ano['Faturamento Total Líquido de Serviços de Plantão'].sum()
+                    fat_total = df_ano['Faturamento Total Líquido Hospital'].sum()
+                    representatividade = (fat_plantao / fat_total * 100) if fat_total > 0 else 0
+                    
+                    ticket_values.append(ticket_medio)
+                    rep_values.append(representatividade)
             
-            # Indicador de Ticket Médio
+            # Adiciona barras para o ticket médio
             fig.add_trace(
-                go.Indicator(
-                    mode="number+delta",
-                    value=ticket_medio_plantao,
-                    number={'prefix': "R$", 'valueformat': ",.2f"},
-                    delta={'reference': ticket_medio_geral,
-                          'relative': True,
-                          'valueformat': ".1%"},
-                    title={'text': "Ticket Médio Plantão vs Geral"}
+                go.Bar(
+                    x=anos,
+                    y=ticket_values,
+                    text=[f'R$ {val:,.2f}' for val in ticket_values],
+                    textposition='auto',
+                    name='Ticket Médio',
+                    marker_color='#1f77b4',
+                    offsetgroup=0
                 ),
                 row=1, col=1
             )
-
-            # Calcula a representatividade
-            fat_plantao = df_filtrado['Faturamento Total Líquido de Serviços de Plantão'].sum()
-            fat_total = df_filtrado['Faturamento Total Líquido Hospital'].sum()
-            representatividade = (fat_plantao / fat_total * 100) if fat_total > 0 else 0
             
-            # Indicador de Representatividade
+            # Adiciona linha de representatividade
             fig.add_trace(
-                go.Indicator(
-                    mode="number",
-                    value=representatividade,
-                    number={'suffix': "%", 'valueformat': ".1f"},
-                    title={'text': "Representatividade no Faturamento"}
+                go.Scatter(
+                    x=anos,
+                    y=rep_values,
+                    text=[f'{val:.1f}%' for val in rep_values],
+                    mode='lines+markers+text',
+                    name='Representatividade (%)',
+                    yaxis='y2',
+                    marker_color='#ff7f0e',
+                    textposition='top center'
                 ),
-                row=1, col=2
-            )
+                row=1, col=1
+            )   
 
-            # Gráfico de pizza para distribuição do faturamento
-            fig.add_trace(
-                go.Pie(
-                    labels=['Plantão', 'Outros Atendimentos'],
-                    values=[fat_plantao, fat_total - fat_plantao],
-                    hole=0.4,
-                    marker=dict(colors=['#e377c2', '#1f77b4'])
-                ),
-                row=2, col=1
-            )
+            # Gráfico inferior - Evolução temporal
+            cores = {
+                'ticket_geral': cores_por_ano(anos, ['#2ca02c', '#1f77b4'], 'Greens'),  # Verde e azul para o ticket médio geral
+                'ticket_plantao': cores_por_ano(anos, ['#e377c2', '#d62728'], 'Reds')   # Rosa e vermelho para o ticket plantão
+            }
+
+             # Adiciona as linhas para cada ano
+            for ano, df_ano in grupos:
+                if len(df_ano['Mês']) > 0:
+                    # Linha do ticket médio geral
+                    fig.add_trace(
+                        go.Scatter(
+                            x=df_ano['Mês'],
+                            y=df_ano['Ticket Médio Geral'],
+                            name=f'Ticket Médio Geral {ano}',
+                            mode='lines+markers',
+                            line=dict(
+                                color=cores['ticket_geral'][ano],
+                                dash='dot'
+                            ),
+                            marker=dict(size=8)
+                        ),
+                        row=2, col=1
+                    )
+                    
+                    # Linha do ticket médio plantão
+                    fig.add_trace(
+                        go.Scatter(
+                            x=df_ano['Mês'],
+                            y=df_ano['Ticket Médio de Atendimento de Plantão'],
+                            name=f'Ticket Plantão {ano}',
+                            mode='lines+markers',
+                            line=dict(
+                                color=cores['ticket_plantao'][ano]
+                            ),
+                            marker=dict(size=8)
+                        ),
+                        row=2, col=1
+                    )
 
             # Atualiza o layout
             fig.update_layout(
                 height=800,
                 showlegend=True,
-                title_text=f"Impacto do Plantão no Faturamento - {', '.join(unidade_selecionada)}",
+                title_text=f"Análise do Ticket Médio de Plantão - {', '.join(unidade_selecionada)}",
                 legend=dict(
                     orientation="h",
                     yanchor="bottom",
@@ -1163,15 +2105,641 @@ def criar_grafico_ticket_plantao(df7, tipo, unidade_selecionada, ano_selecionado
                 )
             )
             
-        return fig
+            # Atualiza formatação dos eixos
+            fig.update_yaxes(
+                title_text="Ticket Médio (R$)", 
+                tickformat="R$,.2f",
+                row=1, col=1
+            )
+            fig.update_yaxes(
+                title_text="Ticket Médio (R$)", 
+                tickformat="R$,.2f",
+                row=2, col=1
+            )
+            fig.update_xaxes(title_text="Unidade", row=1, col=1)
+            fig.update_xaxes(title_text="Mês", row=2, col=1)
+
+    if tipo == 'Impacto no Faturamento':
+        # Primeiro verifica se o dataframe está vazio
+        if df_filtrado.empty:
+            raise GraficoIndisponivel("Não há dados disponíveis para o período selecionado.")
+            
+        # Verifica se todas as colunas necessárias existem
+        colunas_necessarias = [
+            'Faturamento Total Líquido de Serviços de Plantão',
+            'Total Consultas Plantão',
+            'Faturamento Total Líquido Hospital'
+        ]
+        
+        if not all(coluna in df_filtrado.columns for coluna in colunas_necessarias):
+            raise GraficoIndisponivel("Algumas colunas necessárias não estão disponíveis para análise de impacto no faturamento.")
+            
+        # Cria os subplots
+        fig = make_subplots(
+            rows=2, cols=2,
+            specs=[[{"type": "indicator"}, {"type": "indicator"}],
+                  [{"type": "pie", "colspan": 2}, None]],
+            subplot_titles=('Ticket Médio Plantão', 'Representatividade', 'Distribuição do Faturamento')
+        )
+
+        # Calcula o ticket médio do plantão
+        ticket_medio_plantao = (df_filtrado['Faturamento Total Líquido de Serviços de Plantão'].sum() / 
+                              df_filtrado['Total Consultas Plantão'].sum())
+        
+        # Calcula o ticket médio geral
+        ticket_medio_geral = (df_filtrado['Faturamento Total Líquido Hospital'].sum() / 
+                            df_filtrado['Total Consultas Plantão'].sum())
+        
+        # Indicador de Ticket Médio
+        fig.add_trace(
+            go.Indicator(
+                mode="number+delta",
+                value=ticket_medio_plantao,
+                number={'prefix': "R$", 'valueformat': ",.2f"},
+                delta={'reference': ticket_medio_geral,
+                      'relative': True,
+                      'valueformat': ".1%"},
+                title={'text': "Ticket Médio Plantão vs Geral"}
+            ),
+            row=1, col=1
+        )
+
+        # Calcula a representatividade
+        fat_plantao = df_filtrado['Faturamento Total Líquido de Serviços de Plantão'].sum()
+        fat_total = df_filtrado['Faturamento Total Líquido Hospital'].sum()
+        representatividade = (fat_plantao / fat_total * 100) if fat_total > 0 else 0
+        
+        # Indicador de Representatividade
+        fig.add_trace(
+            go.Indicator(
+                mode="number",
+                value=representatividade,
+                number={'suffix': "%", 'valueformat': ".1f"},
+                title={'text': "Representatividade no Faturamento"}
+            ),
+            row=1, col=2
+        )
+
+        # Gráfico de pizza para distribuição do faturamento
+        fig.add_trace(
+            go.Pie(
+                labels=['Plantão', 'Outros Atendimentos'],
+                values=[fat_plantao, fat_total - fat_plantao],
+                hole=0.4,
+                marker=dict(colors=['#e377c2', '#1f77b4'])
+            ),
+            row=2, col=1
+        )
+
+        # Atualiza o layout
+        fig.update_layout(
+            height=800,
+            showlegend=True,
+            title_text=f"Impacto do Plantão no Faturamento - {', '.join(unidade_selecionada)}",
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=-0.2,
+                xanchor="center",
+                x=0.5
+            )
+        )
         
+    return fig
+
+
+# Acima deste número de unidades as séries mensais ganham um painel por unidade
+LIMITE_UNIDADES_SEM_FACETAS = 2
+# Painéis por linha no gráfico facetado
+COLUNAS_FACETAS = 4
+# Pontos por figura a partir dos quais as linhas são desenhadas com WebGL
+LIMITE_PONTOS_WEBGL = 1000
+
+# Séries mensais de cada métrica no caminho facetado; cada série é uma
+# coluna da tabela ou uma função que a calcula a partir da fatia filtrada
+SERIES_FACETADAS = {
+    'Perfil de Clientes': {
+        'tabela': 'Tabela3', 'tipo': 'barra', 'eixo_y': 'Total de Clientes',
+        'series': {
+            categoria: f'Total Consulta Plantão - {categoria}'
+            for categoria in ['Novos', 'Retornantes', 'Google Novos', 'Google Retornantes']
+        }
+    },
+    'Total Consultas (Dia vs Plantão)': {
+        'tabela': 'Tabela1', 'tipo': 'linha', 'eixo_y': 'Número de Consultas',
+        'series': {'Dia': 'Total Consultas Dia', 'Plantão': 'Total Consultas Plantão'}
+    },
+    'Evolução Temporal Consultas': {
+        'tabela': 'Tabela1', 'tipo': 'linha', 'eixo_y': 'Total de Consultas',
+        'series': {'Total': lambda df: df['Total Consultas Dia'] + df['Total Consultas Plantão']}
+    },
+    'Novos vs Retornantes': {
+        'tabela': 'Tabela2', 'tipo': 'barra', 'eixo_y': 'Número de Clientes',
+        'series': {'Novos': 'Total Consulta Dia - Novos', 'Retornantes': 'Total Consulta Dia - Retornantes'}
+    },
+    'Origem Google': {
+        'tabela': 'Tabela2', 'tipo': 'barra', 'eixo_y': 'Número de Clientes',
+        'series': {
+            'Google Novos': 'Total Consultas Dia - Google Novos',
+            'Google Retornantes': 'Total Consulta Dia - Google Retornantes'
+        }
+    },
+    'Faturamento por Tipo': {
+        'tabela': 'Tabela5', 'tipo': 'barra', 'eixo_y': 'Faturamento (R$)',
+        'series': {
+            'Clientes Novos': 'Faturamento Clientes Novos',
+            'Clientes Retornantes': 'Faturamento Clientes Retornantes'
+        }
+    },
+    'Ticket Médio': {
+        'tabela': 'Tabela5', 'tipo': 'linha', 'eixo_y': 'Ticket Médio (R$)',
+        'series': {'Ticket Médio': lambda df: df['Faturamento Total'] / df['Total Clientes'].replace(0, np.nan)}
+    },
+    'Evolução Ticket Plantão': {
+        'tabela': 'Tabela7', 'tipo': 'linha', 'eixo_y': 'Ticket Médio (R$)',
+        'series': {
+            'Ticket Plantão': 'Ticket Médio de Atendimento de Plantão',
+            'Ticket Geral': lambda df: df['Faturamento Total Líquido Hospital'] / df['Total Consultas Plantão']
+        }
+    },
+}
+
+def criar_grafico_facetado(metrica, tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Cria a série mensal da métrica com um painel por unidade e uma cor por ano"""
+    config = SERIES_FACETADAS[metrica]
+    df_filtered = filtrar_selecao(tabelas[config['tabela']], unidade_selecionada, ano_selecionado, mes_selecionado)
+
+    unidades = list(unidade_selecionada)
+    num_colunas = min(COLUNAS_FACETAS, len(unidades))
+    num_linhas = -(-len(unidades) // num_colunas)
+    fig = make_subplots(
+        rows=num_linhas, cols=num_colunas,
+        subplot_titles=unidades,
+        shared_yaxes=True,
+        horizontal_spacing=0.03,
+        vertical_spacing=min(0.3 / num_linhas, 0.12)
+    )
+
+    # Cada série vira um array uma única vez; um groupby por (Unidade, Ano)
+    # dá as posições de cada traço
+    series = {
+        rotulo: (df_filtered[serie] if isinstance(serie, str) else serie(df_filtered)).to_numpy()
+        for rotulo, serie in config['series'].items()
+    }
+    meses = df_filtered['Mês'].to_numpy()
+    posicoes = df_filtered.groupby(['Unidade', 'Ano'], sort=False, observed=True).indices
+    cores = cores_por_ano(ano_selecionado, px.colors.qualitative.Set1, 'Turbo', faixa=(0.05, 0.95))
+    tracos = ['solid', 'dash', 'dot', 'dashdot']
+    padroes = ['', '/', '.', 'x']
+
+    # Com muitos pontos as linhas usam Scattergl, desenhado pela GPU
+    webgl = config['tipo'] == 'linha' and len(df_filtered) * len(series) > LIMITE_PONTOS_WEBGL
+
+    # Os traços são montados como dicionários e adicionados de uma vez,
+    # bem mais rápido que um add_trace por traço
+    traces = []
+    legendas = set()
+    for k, unidade in enumerate(unidades):
+        eixo = '' if k == 0 else str(k + 1)
+        for ano in sorted(ano_selecionado):
+            pos = posicoes.get((unidade, ano))
+            if pos is None:
+                continue
+            for s, (rotulo, valores) in enumerate(series.items()):
+                grupo = f'{rotulo} {ano}'
+                trace = dict(
+                    x=meses[pos], y=valores[pos], name=grupo,
+                    legendgroup=grupo, showlegend=grupo not in legendas,
+                    xaxis=f'x{eixo}', yaxis=f'y{eixo}'
+                )
+                legendas.add(grupo)
+                if config['tipo'] == 'linha':
+                    trace.update(
+                        type='scattergl' if webgl else 'scatter', mode='lines+markers',
+                        line=dict(color=cores[ano], dash=tracos[s % len(tracos)])
+                    )
+                else:
+                    trace.update(
+                        type='bar',
+                        marker=dict(color=cores[ano], pattern_shape=padroes[s % len(padroes)])
+                    )
+                traces.append(trace)
+    fig.add_traces(traces)
+
+    fig.update_layout(
+        height=max(400, 280 * num_linhas),
+        showlegend=True,
+        barmode='group',
+        title_text=f"{metrica} - {len(unidades)} unidades",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    fig.update_yaxes(title_text=config['eixo_y'], col=1)
+    if '(R$)' in config['eixo_y']:
+        fig.update_yaxes(tickformat="R$,.2f")
+
+    return fig
+
+
+# Tabelas usadas pelos gráficos de cada categoria
+TABELAS_POR_CATEGORIA = {
+    'Consultas': ['Tabela1'],
+    'Clientes': ['Tabela2', 'Tabela3'],
+    'Faturamento': ['Tabela5', 'Tabela3'],
+    'Análise Plantão': TABELAS_PLANTAO,
+    'Ticket Médio Plantão': ['Tabela7'],
+}
+
+# Planilhas dos indicadores e destaques, exibidos junto com qualquer gráfico
+TABELAS_INDICADORES = ['Tabela1', 'Tabela2', 'Tabela5']
+
+def tabelas_necessarias(metricas):
+    """Planilhas usadas pelas métricas selecionadas [(categoria, métrica)] e pelos indicadores"""
+    nomes = set(TABELAS_INDICADORES)
+    for categoria, _ in metricas:
+        nomes.update(TABELAS_POR_CATEGORIA[categoria])
+    return nomes
+
+def construir_grafico(categoria, metrica, tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Cria a figura da métrica; tabelas é um dicionário {nome da planilha: DataFrame}"""
+    # Com muitas unidades as séries mensais ficam ilegíveis em um só painel
+    if len(unidade_selecionada) > LIMITE_UNIDADES_SEM_FACETAS and metrica in SERIES_FACETADAS:
+        return criar_grafico_facetado(
+            metrica, tabelas, unidade_selecionada,
+            ano_selecionado, mes_selecionado
+        )
+
+    if categoria == 'Análise Plantão':
+        return criar_grafico_plantao(
+            tabelas['Tabela4A'], tabelas['Tabela4B'], tabelas['Tabela4C'],
+            tabelas['Tabela4D'], tabelas['Tabela4E'],
+            metrica, unidade_selecionada,
+            ano_selecionado, mes_selecionado
+        )
+
+    elif categoria == 'Consultas':
+        return criar_grafico_consultas(
+            tabelas['Tabela1'], metrica, unidade_selecionada,
+            ano_selecionado, mes_selecionado
+        )
+
+    elif categoria == 'Clientes':
+        if metrica == 'Perfil de Clientes':
+            return criar_grafico_perfil_clientes(
+                tabelas['Tabela3'], unidade_selecionada, ano_selecionado, mes_selecionado
+            )
+        else:
+            return criar_grafico_clientes(
+                tabelas['Tabela2'], tabelas['Tabela3'], metrica, unidade_selecionada,
+                ano_selecionado, mes_selecionado
+            )
+
+    elif categoria == 'Faturamento':
+        return criar_grafico_faturamento(
+            tabelas['Tabela5'], tabelas['Tabela3'], metrica, unidade_selecionada,
+            ano_selecionado, mes_selecionado
+        )
+
+    elif categoria == 'Ticket Médio Plantão':
+        return criar_grafico_ticket_plantao(
+            tabelas['Tabela7'], metrica, unidade_selecionada,
+            ano_selecionado, mes_selecionado
+        )
+
+    return None
+
+@st.cache_resource
+def _cache_figuras():
+    """Figuras já construídas, compartilhadas entre reruns e sessões"""
+    return _CacheLRU(tamanho_maximo=64)
+
+def grafico_em_cache(categoria, metrica, tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Retorna (figura, JSON da figura) para a seleção, reaproveitando figuras já criadas"""
+    # A chave leva a versão de cada célula (Unidade, Ano) selecionada: quando
+    # o Excel muda, só as figuras que usam células alteradas são refeitas
+    usadas = tuple(tabelas[nome] for nome in TABELAS_POR_CATEGORIA[categoria])
+    versoes = tuple(
+        (tuple(df.columns), tuple(
+            _versoes_celulas(df).get((unidade, ano))
+            for unidade in unidade_selecionada for ano in ano_selecionado
+        ))
+        for df in usadas
+    )
+    chave = (
+        categoria, metrica,
+        tuple(unidade_selecionada), tuple(ano_selecionado), tuple(mes_selecionado),
+        versoes
+    )
+    cache = _cache_figuras()
+    with medir_etapa('cache'):
+        entrada = cache.buscar(chave)
+    if entrada is not None:
+        return entrada
+    with medir_etapa('figura'):
+        fig = construir_grafico(
+            categoria, metrica, tabelas,
+            unidade_selecionada, ano_selecionado, mes_selecionado
+        )
+    # Falhas (fig None) não vão para o cache, para serem tentadas de novo
+    if fig is None:
+        return None, None
+    # A figura é serializada uma única vez; nos reruns seguintes o JSON pronto
+    # vai direto ao navegador, sem nova validação e codificação pelo Plotly
+    with medir_etapa('serializacao'):
+        spec = pio.to_json(fig, validate=False)
+    cache.guardar(chave, (fig, spec))
+    return fig, spec
+
+def resultado_grafico(categoria, metrica, tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Calcula a métrica sem efeitos na página; retorna (figura, JSON, aviso)"""
+    # aviso é None ou (tipo de elemento, texto) a exibir no lugar do gráfico
+    try:
+        fig, spec = grafico_em_cache(
+            categoria, metrica, tabelas,
+            unidade_selecionada, ano_selecionado, mes_selecionado
+        )
+    except GraficoIndisponivel as e:
+        return None, None, ('warning', str(e))
     except Exception as e:
-        st.error(f"Erro ao criar o gráfico: {str(e)}")
-        st.write("Debug - Erro detalhado:", e)
-        return None
+        return None, None, ('error', f'Erro ao criar o gráfico: {str(e)}')
+    if fig is None:
+        return None, None, ('warning', f'Não foi possível criar o gráfico {metrica}.')
+    return fig, spec, None
+
+def exibir_grafico(container, resultado):
+    """Exibe no container a figura calculada ou o aviso que a substitui"""
+    fig, spec, aviso = resultado
+    if aviso is not None:
+        tipo, texto = aviso
+        getattr(container, tipo)(texto)
+    else:
+        exibir_figura(container, fig, spec)
+
+def _enviar_spec(container, spec, altura):
+    """Envia ao navegador o JSON já serializado pela API interna do Streamlit"""
+    proto = PlotlyChartProto()
+    proto.spec = spec
+    proto.config = '{}'
+    proto.theme = 'streamlit'
+    proto.form_id = current_form_id(container)
+    proto.id = compute_and_register_element_id(
+        'plotly_chart',
+        user_key=None,
+        key_as_main_identity=False,
+        dg=container,
+        plotly_spec=spec,
+        plotly_config=proto.config,
+        theme=proto.theme,
+        width='stretch',
+        height=altura,
+    )
+    container._enqueue('plotly_chart', proto, layout_config=LayoutConfig(width='stretch', height=altura))
+
+def exibir_figura(container, fig, spec):
+    """Exibe a figura no container enviando ao navegador o JSON já serializado"""
+    global PlotlyChartProto
+    if PlotlyChartProto is not None:
+        altura = fig.layout.height if fig.layout.height else 450
+        try:
+            _enviar_spec(container, spec, altura)
+            return
+        except Exception as e:
+            # A API interna mudou nesta versão do Streamlit: usa o caminho público daqui em diante
+            logger.warning('Envio direto do gráfico indisponível, usando st.plotly_chart: %s', e)
+            PlotlyChartProto = None
+    container.plotly_chart(fig, use_container_width=True)
+
+# Limite de threads usadas na construção paralela dos gráficos
+MAX_THREADS_GRAFICOS = 8
+
+def construir_graficos_em_paralelo(metricas, tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Calcula as métricas ao mesmo tempo; retorna [(figura, JSON, aviso)] na ordem da grade"""
+    # O cálculo não escreve na página; as threads recebem o contexto do rerun
+    # apenas para usar os caches do Streamlit
+    ctx = get_script_run_ctx()
+    perfil = perfil_atual()
+
+    def construir(categoria, metrica):
+        with usar_perfil(perfil, f'{categoria} / {metrica}'):
+            return resultado_grafico(
+                categoria, metrica, tabelas,
+                unidade_selecionada, ano_selecionado, mes_selecionado
+            )
+
+    num_threads = min(len(metricas), os.cpu_count() or 1, MAX_THREADS_GRAFICOS)
+    with ThreadPoolExecutor(
+        max_workers=max(num_threads, 1),
+        thread_name_prefix='graficos',
+        initializer=add_script_run_ctx,
+        initargs=(None, ctx)
+    ) as executor:
+        futuros = [
+            executor.submit(construir, categoria, metrica)
+            for categoria, metrica in metricas
+        ]
+        return [futuro.result() for futuro in futuros]
+
+
+# Números do cabeçalho e dos destaques, calculados sem escrever na página
+
+def calcular_indicadores(tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Indicadores gerais da seleção; tabelas é um dicionário {nome da planilha: DataFrame}"""
+    # Os indicadores são somas sobre os cubos montados na carga, sem
+    # percorrer as tabelas; o custo não cresce com o histórico
+    total_consultas = cubo_indicadores(tabelas['Tabela1']).somar(
+        'Total Consultas Dia', unidade_selecionada, ano_selecionado, mes_selecionado
+    )
+    total_novos = cubo_indicadores(tabelas['Tabela2']).somar(
+        'Total Consulta Dia - Novos', unidade_selecionada, ano_selecionado, mes_selecionado
+    )
+    faturamento = cubo_indicadores(tabelas['Tabela5'])
+    faturamento_total = faturamento.somar(
+        'Faturamento Total', unidade_selecionada, ano_selecionado, mes_selecionado
+    )
+    # Faturamento do ano anterior ao menor ano selecionado, para o crescimento
+    ano_anterior_total = faturamento.somar(
+        'Faturamento Total', unidade_selecionada,
+        [min(ano_selecionado) - 1], mes_selecionado
+    )
+    return {
+        'total_consultas': total_consultas,
+        'total_novos': total_novos,
+        'faturamento_total': faturamento_total,
+        'ticket_medio': faturamento_total / total_novos if total_novos > 0 else 0,
+        'crescimento': ((faturamento_total - ano_anterior_total) / ano_anterior_total) * 100 if ano_anterior_total > 0 else 0,
+    }
+
+def calcular_indicadores_plantao(tabelas, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Indicadores de plantão da seleção, somados na tabela de fatos dos plantões"""
+    fatos = fatos_plantao([tabelas[nome] for nome in TABELAS_PLANTAO])
+    # Totais de cada tipo de plantão (segmento 'Total', da Tabela4A)
+    somas = fatos.reduzir(
+        ['medida', 'tipo'], unidade_selecionada, ano_selecionado, mes_selecionado,
+        segmento='Total'
+    )
+    consultas = somas.get('consultas', pd.Series(dtype=float))
+    faturamento = somas.get('faturamento', pd.Series(dtype=float))
+
+    # Soma de todos os tipos de consultas de plantão
+    total_plantao = int(consultas.sum())
+    fat_plantao = float(faturamento.sum())
+    return {
+        'total_plantao': total_plantao,
+        'total_emergencia': int(consultas.get('Emergencial', 0)),
+        'fat_plantao': fat_plantao,
+        'ticket_plantao': fat_plantao / total_plantao if total_plantao > 0 else 0,
+    }
 
+def calcular_destaques(df5, unidade_selecionada, ano_selecionado, mes_selecionado):
+    """Destaques automáticos de faturamento da seleção"""
+    df_filtered = filtrar_selecao(df5, unidade_selecionada, ano_selecionado, mes_selecionado)
+
+    # Ano com maior faturamento entre os selecionados
+    faturamento_por_ano = df_filtered.groupby('Ano')['Faturamento Total'].sum().to_dict()
+
+    # Categoria com maior faturamento e proporção entre elas
+    faturamento_novos = df_filtered['Faturamento Clientes Novos'].sum()
+    faturamento_retornantes = df_filtered['Faturamento Clientes Retornantes'].sum()
+    proporcao_novos = (faturamento_novos / (faturamento_novos + faturamento_retornantes)) * 100
+    return {
+        'mes_maior_faturamento': df_filtered.loc[df_filtered['Faturamento Total'].idxmax()]['Mês'],
+        'ano_maior_crescimento': max(ano_selecionado, key=lambda ano: faturamento_por_ano.get(ano, 0)),
+        'categoria_destaque': 'Clientes Novos' if faturamento_novos > faturamento_retornantes else 'Clientes Retornantes',
+        'proporcao_novos': proporcao_novos,
+        'proporcao_retornantes': 100 - proporcao_novos,
+    }
+
+def selecao_padrao(df1):
+    """Unidades e anos selecionados ao abrir o dashboard"""
+    unidades = sorted(df1['Unidade'].unique())
+    anos = sorted(df1['Ano'].unique())
+    return (
+        [unidades[0]] if len(unidades) > 1 else unidades,
+        anos[-2:] if len(anos) > 1 else anos
+    )
+
+def _aquecer_figuras(tabelas):
+    """Constrói as figuras da seleção padrão nas categorias com planilhas já carregadas"""
+    # As planilhas que nenhuma sessão usou continuam sem ser lidas
+    carregadas = tabelas.carregadas()
+    try:
+        unidades, anos = selecao_padrao(tabelas['Tabela1'])
+    except Exception as e:
+        logger.warning('Falha ao carregar a Tabela1: %s', e)
+        return
+    for categoria, metricas in METRICAS_DISPONIVEIS.items():
+        if any(nome not in carregadas for nome in TABELAS_POR_CATEGORIA[categoria]):
+            continue
+        for metrica in metricas:
+            # Uma figura que falha não impede a troca: ela é tentada de novo
+            # (e o erro exibido) quando a métrica for pedida
+            try:
+                grafico_em_cache(categoria, metrica, tabelas, unidades, anos, ORDEM_MESES)
+            except Exception as e:
+                logger.warning('Falha ao preparar %s: %s', metrica, e)
+
+def _observar_arquivo(caminho, parar):
+    """Laço do observador: recarrega e publica uma nova versão quando o arquivo muda"""
+    ultimo_erro = None
+    # O laço termina quando parar_observador(caminho) sinaliza o evento
+    while not parar.wait(INTERVALO_OBSERVADOR):
+        try:
+            mtime_publicado, publicadas = _versoes_publicadas()[caminho]
+            if os.stat(caminho).st_mtime_ns == mtime_publicado:
+                continue
+            # Recarga incremental (só as planilhas alteradas): as planilhas já
+            # usadas na versão em uso, seus índices e as figuras da seleção
+            # padrão ficam prontos antes da troca
+            _, mtime_ns, conteudo_hash = _assinatura_arquivo(caminho)
+            tabelas = _carregar_tabelas(caminho, conteudo_hash)
+            tabelas.antecipar(publicadas.carregadas())
+            _aquecer_figuras(tabelas)
+            _publicar_versao(caminho, mtime_ns, tabelas)
+            ultimo_erro = None
+        except Exception as e:
+            # Arquivo ainda sendo gravado ou inválido: a versão em uso é
+            # mantida e a leitura é tentada de novo no próximo ciclo
+            if str(e) != ultimo_erro:
+                logger.warning('Falha ao recarregar %s: %s', caminho, e)
+                ultimo_erro = str(e)
+
+def iniciar_observador(caminho):
+    """Inicia a thread que observa o arquivo; no máximo uma por caminho no processo"""
+    # O registro fica fora dos caches do Streamlit: st.cache_resource.clear()
+    # não deixa um segundo laço rodando ao lado do primeiro
+    return iniciar_observador_arquivo(caminho, _observar_arquivo)
+
+def parar_observador(caminho, espera=None):
+    """Encerra o observador do arquivo, se houver um"""
+    parado = parar_observador_arquivo(caminho, espera)
+    # Sem observador a versão publicada ficaria desatualizada: a próxima
+    # carga volta a conferir o arquivo e inicia um novo observador
+    _versoes_publicadas().pop(caminho, None)
+    return parado
+
+
+def perfil_solicitado():
+    """Indica se o rerun deve ser medido (variável de ambiente ou ?perfil=1)"""
+    return PERFIL_AMBIENTE or st.query_params.get('perfil', '') in ('1', 'true', 'sim')
+
+def exibir_perfil(perfil):
+    """Painel na barra lateral com o tempo do rerun por etapa e por métrica"""
+    etapas = perfil.por_etapa()
+    with st.sidebar.expander(f"Desempenho do rerun: {perfil.total * 1000:.0f} ms", expanded=True):
+        st.dataframe(
+            pd.DataFrame({
+                'Etapa': list(etapas),
+                'ms': [segundos * 1000 for segundos in etapas.values()],
+                '%': [segundos / perfil.total * 100 if perfil.total else 0 for segundos in etapas.values()],
+            }).sort_values('ms', ascending=False),
+            hide_index=True,
+            column_config={
+                'ms': st.column_config.NumberColumn(format='%.1f'),
+                '%': st.column_config.NumberColumn(format='%.0f%%'),
+            }
+        )
+        metricas = perfil.por_metrica()
+        if metricas:
+            st.caption("Por métrica (ms)")
+            tabela = pd.DataFrame(metricas).T.fillna(0) * 1000
+            tabela['total'] = tabela.sum(axis=1)
+            st.dataframe(tabela.sort_values('total', ascending=False), column_config={
+                coluna: st.column_config.NumberColumn(format='%.1f') for coluna in tabela.columns
+            })
+            if perfil.selecao.get('paralelo'):
+                st.caption("No modo paralelo as métricas se sobrepõem no tempo do rerun.")
+
+def gravar_perfil(perfil, caminho):
+    """Acrescenta o perfil do rerun como uma linha JSON no arquivo"""
+    registro = {
+        'data': perfil.data.isoformat(timespec='seconds'),
+        'total': perfil.total,
+        'selecao': perfil.selecao,
+        'etapas': perfil.por_etapa(),
+        'metricas': perfil.por_metrica(),
+    }
+    # Uma única escrita por linha: reruns de sessões diferentes não se misturam
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + '\n')
 
 def criar_dashboard():
+    """Monta a página; no modo de perfil mede o rerun e exibe as etapas"""
+    if not perfil_solicitado():
+        montar_dashboard()
+        return
+    with usar_perfil(PerfilRerun()) as perfil:
+        montar_dashboard()
+    perfil.concluir()
+    exibir_perfil(perfil)
+    if ARQUIVO_PERFIL:
+        gravar_perfil(perfil, ARQUIVO_PERFIL)
+
+def montar_dashboard():
     
     # Configurações de estilo
     st.markdown("""
@@ -1196,44 +2764,72 @@ def criar_dashboard():
     # df3: Consultas plantão
     # df4a-e: Detalhamento dos plantões
     # df5: Faturamento
-    df1, df2, df3, df4a, df4b, df4c, df4d, df4e, df5, df7 = load_data('Análise mês Clientes Comparativo anos.xlsx')
+    fontes = descobrir_planilhas(PASTA_PLANILHAS) if PASTA_PLANILHAS else []
+    if fontes:
+        # Uma planilha por unidade: a unidade é escolhida antes da carga e só
+        # as planilhas das unidades selecionadas são lidas
+        with medir_etapa('carga'):
+            catalogo = catalogo_unidades(fontes)
+        unidades = sorted(catalogo)
+        with st.sidebar:
+            st.title("Filtros")
+            unidade_selecionada = st.multiselect(
+                'Unidade',
+                unidades,
+                default=unidades[:1]
+            )
+        if not unidade_selecionada:
+            st.warning('Por favor, selecione pelo menos uma unidade.')
+            return
+        with medir_etapa('carga'):
+            dados = load_fontes({caminho for unidade in unidade_selecionada for caminho in catalogo[unidade]})
+    else:
+        with medir_etapa('carga'):
+            dados = load_data(ARQUIVO_EXCEL)
     # Verifica se os dados foram carregados corretamente
-    if df1 is None:
+    if dados is None:
+        return
+    # As planilhas são lidas sob demanda: os filtros só precisam da Tabela1
+    tabelas = dados
+    try:
+        with medir_etapa('carga'):
+            df1 = tabelas['Tabela1']
+    except Exception as e:
+        st.error(f'Erro ao carregar dados: {str(e)}')
         return
+    # A mesma seleção inicial para a qual o observador deixa as figuras prontas
+    unidades_padrao, anos_padrao = selecao_padrao(df1)
     
     # Sidebar para filtros e seleção de gráficos
     with st.sidebar:
-        st.title("Filtros")
-        
-        # Filtro de unidade com limite de seleção
-        unidades = sorted(df1['Unidade'].unique())
-        if len(unidades) > 1:
-            unidade_selecionada = st.multiselect(
-                'Unidade (máx. 2)',
-                unidades,
-                default=[unidades[0]],
-                max_selections=2
-            )
-        else:
-            unidade_selecionada = unidades
-        
-        # Filtro de ano com limite de seleção
+        if not fontes:
+            st.title("Filtros")
+
+            # Filtro de unidade; com mais de duas as séries mensais são facetadas
+            unidades = sorted(df1['Unidade'].unique())
+            if len(unidades) > 1:
+                unidade_selecionada = st.multiselect(
+                    'Unidade',
+                    unidades,
+                    default=unidades_padrao
+                )
+            else:
+                unidade_selecionada = unidades
+
+        # Filtro de ano
         anos = sorted(df1['Ano'].unique())
         ano_selecionado = st.multiselect(
-            'Ano (máx. 2)',
+            'Ano',
             anos,
-            default=anos[-2:] if len(anos) > 1 else anos,
-            max_selections=2
-        ) 
+            default=anos_padrao
+        )
     
         
         # Filtro de mês
-        ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                      'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
         mes_selecionado = st.multiselect(
             'Mês',
-            ordem_meses,
-            default=ordem_meses
+            ORDEM_MESES,
+            default=ORDEM_MESES
         )
         st.write("Meses selecionados:", mes_selecionado)
 
@@ -1256,69 +2852,84 @@ def criar_dashboard():
             horizontal=True,
             help="Selecione quantos gráficos deseja ver por linha"
         )
+        construcao_paralela = st.toggle(
+            "Construir gráficos em paralelo",
+            help="Calcula todos os gráficos selecionados ao mesmo tempo antes de exibi-los"
+        )
+
+        # Preenchido só no fim da montagem, depois da carga das planilhas da seleção
+        painel_memoria = st.expander("Uso de memória das tabelas")
+
+    def exibir_memoria():
+        painel_memoria.dataframe(relatorio_memoria(tabelas.carregadas()), hide_index=True)
 
     # Validações de seleção
     if not unidade_selecionada:
         st.warning('Por favor, selecione pelo menos uma unidade.')
+        exibir_memoria()
         return
     
     if not ano_selecionado:
         st.warning('Por favor, selecione pelo menos um ano.')
+        exibir_memoria()
         return
     
     if not mes_selecionado:
         st.warning('Por favor, selecione pelo menos um mês.')
+        exibir_memoria()
         return
     
+    perfil = perfil_atual()
+    if perfil is not None:
+        perfil.selecao = {
+            'unidades': [str(u) for u in unidade_selecionada],
+            'anos': [int(a) for a in ano_selecionado],
+            'meses': len(mes_selecionado),
+            'metricas': [metrica for _, metrica in metricas_selecionadas],
+            'paralelo': bool(construcao_paralela),
+        }
+
     # Layout principal
     if not metricas_selecionadas:
         st.info("Selecione os gráficos que deseja visualizar no menu lateral.")
+        # A página já foi montada: o Plotly é importado enquanto o usuário
+        # escolhe os gráficos
+        preaquecer_graficos()
+        exibir_memoria()
         return
-    
-    
+
+    # Lê de uma vez as planilhas das métricas escolhidas e dos indicadores
+    faltantes = tabelas.faltantes(tabelas_necessarias(metricas_selecionadas))
+    if faltantes:
+        try:
+            with medir_etapa('carga'), st.spinner("Carregando as planilhas dos gráficos..."):
+                tabelas.antecipar(faltantes)
+        except Exception as e:
+            st.error(f'Erro ao carregar dados: {str(e)}')
+            exibir_memoria()
+            return
+    exibir_memoria()
 
     # Exibe os indicadores selecionados
     st.markdown("### Indicadores Selecionados")
     col_indicators = st.columns(5)  # Ajustado para 5 colunas
 
+    with medir_etapa('indicadores'):
+        indicadores = calcular_indicadores(tabelas, unidade_selecionada, ano_selecionado, mes_selecionado)
     with col_indicators[0]:
-        total_consultas = df1[
-            (df1['Unidade'].isin(unidade_selecionada)) &
-            (df1['Ano'].isin(ano_selecionado)) &
-            (df1['Mês'].isin(mes_selecionado))
-        ]['Total Consultas Dia'].sum()
-        st.metric("Total de Consultas", f"{total_consultas:,}")
+        st.metric("Total de Consultas", f"{indicadores['total_consultas']:,}")
 
     with col_indicators[1]:
-        total_novos = df2[
-            (df2['Unidade'].isin(unidade_selecionada)) &
-            (df2['Ano'].isin(ano_selecionado)) &
-            (df2['Mês'].isin(mes_selecionado))
-        ]['Total Consulta Dia - Novos'].sum()
-        st.metric("Novos Clientes", f"{total_novos:,}")
+        st.metric("Novos Clientes", f"{indicadores['total_novos']:,}")
 
     with col_indicators[2]:
-        faturamento_total = df5[
-            (df5['Unidade'].isin(unidade_selecionada)) &
-            (df5['Ano'].isin(ano_selecionado)) &
-            (df5['Mês'].isin(mes_selecionado))
-        ]['Faturamento Total'].sum()
-        st.metric("Faturamento Total", f"R$ {faturamento_total:,.2f}")
+        st.metric("Faturamento Total", f"R$ {indicadores['faturamento_total']:,.2f}")
 
     with col_indicators[3]:
-        ticket_medio = faturamento_total / total_novos if total_novos > 0 else 0
-        st.metric("Ticket Médio", f"R$ {ticket_medio:,.2f}")
+        st.metric("Ticket Médio", f"R$ {indicadores['ticket_medio']:,.2f}")
 
     with col_indicators[4]:
-        # Calcula o faturamento do ano anterior para crescimento
-        ano_anterior_total = df5[
-            (df5['Unidade'].isin(unidade_selecionada)) &
-            (df5['Ano'] == (min(ano_selecionado) - 1)) &  # Ano anterior ao menor ano selecionado
-            (df5['Mês'].isin(mes_selecionado))
-        ]['Faturamento Total'].sum()
-        
-        crescimento = ((faturamento_total - ano_anterior_total) / ano_anterior_total) * 100 if ano_anterior_total > 0 else 0
-        st.metric("Crescimento (%)", f"{crescimento:.2f}%")
+        st.metric("Crescimento (%)", f"{indicadores['crescimento']:.2f}%")
 
     st.markdown("---")
 
@@ -1331,196 +2942,121 @@ def criar_dashboard():
         """, unsafe_allow_html=True)
         
         col_plantao = st.columns(4)
+        with medir_etapa('indicadores'):
+            plantao = calcular_indicadores_plantao(tabelas, unidade_selecionada, ano_selecionado, mes_selecionado)
         
         with col_plantao[0]:
-            # Soma de todos os tipos de consultas de plantão
-            total_plantao = df4a[
-                (df4a['Unidade'].isin(unidade_selecionada)) &
-                (df4a['Ano'].isin(ano_selecionado)) &
-                (df4a['Mês'].isin(mes_selecionado))
-            ][[
-                'Total Consulta Plantão Domingo/Feriado',
-                'Total Consulta Plantão Noturno',
-                'Total Consulta Plantão Sábado',
-                'Total Consulta Procedimento Emergencial Plantão'
-            ]].sum().sum()
-            
-            st.metric("Total de Atendimentos em Plantão", f"{total_plantao:,}")
+            st.metric("Total de Atendimentos em Plantão", f"{plantao['total_plantao']:,}")
             
         with col_plantao[1]:
-            total_emergencia = df4a[
-                (df4a['Unidade'].isin(unidade_selecionada)) &
-                (df4a['Ano'].isin(ano_selecionado)) &
-                (df4a['Mês'].isin(mes_selecionado))
-            ]['Total Consulta Procedimento Emergencial Plantão'].sum()
-            st.metric("Total de Atendimentos de Emergência", f"{total_emergencia:,}")
+            st.metric("Total de Atendimentos de Emergência", f"{plantao['total_emergencia']:,}")
             
         with col_plantao[2]:
-            fat_plantao = df4a[
-                (df4a['Unidade'].isin(unidade_selecionada)) &
-                (df4a['Ano'].isin(ano_selecionado)) &
-                (df4a['Mês'].isin(mes_selecionado))
-            ][[
-                'Faturamento Líquido Total Consulta Plantão Domingo/Feriado',
-                'Faturamento Líquido Total Consulta Plantão Noturno',
-                'Faturamento Líquido Total Consulta Plantão Sábado',
-                'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão'
-            ]].sum().sum()
-            st.metric("Faturamento Total de Plantões", f"R$ {fat_plantao:,.2f}")
+            st.metric("Faturamento Total de Plantões", f"R$ {plantao['fat_plantao']:,.2f}")
             
         with col_plantao[3]:
-            if total_plantao > 0:
-                ticket_plantao = fat_plantao / total_plantao
-            else:
-                ticket_plantao = 0
-            st.metric("Ticket Médio dos Plantões", f"R$ {ticket_plantao:,.2f}")
+            st.metric("Ticket Médio dos Plantões", f"R$ {plantao['ticket_plantao']:,.2f}")
 
     # Obtém o número total de métricas selecionadas pelo usuário
     num_metricas = len(metricas_selecionadas)
 
-    # Cria os gráficos de acordo com as métricas selecionadas
+    # Monta a grade com o título e a explicação de cada métrica
+    containers = []
     for i in range(0, num_metricas, cols_por_linha):
         cols = st.columns(cols_por_linha)
-        
+
         for j in range(cols_por_linha):
             if i + j < num_metricas:
                 categoria, metrica = metricas_selecionadas[i + j]
-                
+
                 with cols[j]:
                     st.markdown(f"#### {metrica}")
-                    
-                    fig = None  # Inicializa fig como None
-                    
-                    if categoria == 'Análise Plantão':
-                        fig = criar_grafico_plantao(
-                            df4a, df4b, df4c, df4d, df4e,
-                            metrica, unidade_selecionada,
-                            ano_selecionado, mes_selecionado
-                        )
-                    
-                    elif categoria == 'Consultas':
-                        fig = criar_grafico_consultas(
-                            df1, metrica, unidade_selecionada, 
-                            ano_selecionado, mes_selecionado
-                        )
 
-                    elif categoria == 'Clientes':
-                        if metrica == 'Perfil de Clientes':
-                            fig = criar_grafico_perfil_clientes(
-                                df3, unidade_selecionada, ano_selecionado, mes_selecionado
-                            )
-                        else:
-                            fig = criar_grafico_clientes(
-                                df2, df3, metrica, unidade_selecionada,
-                                ano_selecionado, mes_selecionado
-                            )
+                    exibir_explicacao(metrica)
+                containers.append(cols[j])
 
-                    elif categoria == 'Faturamento':
-                        fig = criar_grafico_faturamento(
-                            df5, df3, metrica, unidade_selecionada,
-                            ano_selecionado, mes_selecionado
-                        )
-                    
-                    elif categoria == 'Ticket Médio Plantão':  # Adiciona esta condição
-                        fig = criar_grafico_ticket_plantao(
-                            df7, metrica, unidade_selecionada,
-                            ano_selecionado, mes_selecionado
-                        )
-                    
-                    # Verifica se a figura foi criada antes de tentar exibi-la
-                    if fig is not None:
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.warning(f"Não foi possível criar o gráfico {metrica}.")
-
-    df_filtered = df5[
-    (df5['Unidade'].isin(unidade_selecionada)) &
-    (df5['Ano'].isin(ano_selecionado)) &
-    (df5['Mês'].isin(mes_selecionado))
-]
+    # No modo paralelo todas as figuras são calculadas antes da exibição
+    resultados = None
+    if construcao_paralela and num_metricas > 1:
+        resultados = construir_graficos_em_paralelo(
+            metricas_selecionadas, tabelas,
+            unidade_selecionada, ano_selecionado, mes_selecionado
+        )
 
-    # Adicione aqui os destaques automáticos
-    st.markdown("### **Destaques Automáticos**")
+    # Exibe os gráficos de acordo com as métricas selecionadas, na ordem da grade
+    for k, ((categoria, metrica), container) in enumerate(zip(metricas_selecionadas, containers)):
+        with usar_perfil(perfil_atual(), f'{categoria} / {metrica}'):
+            if resultados is not None:
+                resultado = resultados[k]
+            else:
+                resultado = resultado_grafico(
+                    categoria, metrica, tabelas,
+                    unidade_selecionada, ano_selecionado, mes_selecionado
+                )
+            with medir_etapa('exibicao'):
+                exibir_grafico(container, resultado)
 
-    # Destaque 1: Mês com maior faturamento
-    mes_maior_faturamento = df_filtered.loc[df_filtered['Faturamento Total'].idxmax()]['Mês']
-    st.markdown(f"🟢 **Mês com maior faturamento:** {mes_maior_faturamento}")
+    with medir_etapa('indicadores'):
+        destaques = calcular_destaques(tabelas['Tabela5'], unidade_selecionada, ano_selecionado, mes_selecionado)
 
-    # Destaque 2: Ano com maior crescimento
-    faturamento_por_ano = df_filtered.groupby('Ano')['Faturamento Total'].sum().to_dict()
-    ano_maior_crescimento = max(ano_selecionado, key=lambda ano: faturamento_por_ano.get(ano, 0))
-    st.markdown(f"🟢 **Ano com maior crescimento:** {ano_maior_crescimento}")
+    # Adicione aqui os destaques automáticos
+    st.markdown("### **Destaques Automáticos**")
+    st.markdown(f"🟢 **Mês com maior faturamento:** {destaques['mes_maior_faturamento']}")
+    st.markdown(f"🟢 **Ano com maior crescimento:** {destaques['ano_maior_crescimento']}")
+    st.markdown(f"🟢 **Categoria de destaque:** {destaques['categoria_destaque']}")
+    st.markdown(
+        f"🟢 **Proporção do faturamento:** {destaques['proporcao_novos']:.1f}% Novos / "
+        f"{destaques['proporcao_retornantes']:.1f}% Retornantes"
+    )
 
-    # Destaque 3: Categoria com maior faturamento
-    total_faturamento = {
-        'Faturamento Clientes Novos': df_filtered['Faturamento Clientes Novos'].sum(),
-        'Faturamento Clientes Retornantes': df_filtered['Faturamento Clientes Retornantes'].sum()
-    }
-    categoria_destaque = 'Clientes Novos' if total_faturamento['Faturamento Clientes Novos'] > total_faturamento['Faturamento Clientes Retornantes'] else 'Clientes Retornantes'
-    st.markdown(f"🟢 **Categoria de destaque:** {categoria_destaque}")
+# Nomes dos tipos de plantão na distribuição e cores nos comparativos;
+# tipos novos usam o próprio nome e as cores seguintes da paleta
+NOMES_DISTRIBUICAO_PLANTAO = {
+    'Domingo/Feriado': 'Domingos e Feriados',
+    'Sábado': 'Sábados',
+    'Noturno': 'Plantão Noturno',
+    'Emergencial': 'Emergências'
+}
+CORES_PLANTAO = {
+    'Domingo/Feriado': '#1f77b4',
+    'Sábado': '#ff7f0e',
+    'Noturno': '#2ca02c',
+    'Emergencial': '#d62728'
+}
 
-    # Destaque 4: Proporção do faturamento
-    faturamento_novos = total_faturamento['Faturamento Clientes Novos']
-    faturamento_retornantes = total_faturamento['Faturamento Clientes Retornantes']
-    proporcao_novos = (faturamento_novos / (faturamento_novos + faturamento_retornantes)) * 100
-    proporcao_retornantes = 100 - proporcao_novos
-    st.markdown(f"🟢 **Proporção do faturamento:** {proporcao_novos:.1f}% Novos / {proporcao_retornantes:.1f}% Retornantes")
+def cor_plantao(i, tipo):
+    """Cor do tipo de plantão nos gráficos comparativos"""
+    return CORES_PLANTAO.get(tipo, px.colors.qualitative.Set2[i % len(px.colors.qualitative.Set2)])
 
 def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionada, ano_selecionado, mes_selecionado):
     """Cria gráficos para análise de plantão"""
-    
+    # Todas as visões saem de reduções agrupadas na tabela de fatos das
+    # planilhas 4A-4E, em vez de somas coluna a coluna
+    fatos = fatos_plantao([df4a, df4b, df4c, df4d, df4e])
+    selecao = (unidade_selecionada, ano_selecionado, mes_selecionado)
+    anos = sorted(ano_selecionado)
+
     if tipo == 'Distribuição Plantão':
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Distribuição dos Atendimentos de Plantão</h4>
-            <p>Este gráfico mostra a distribuição dos atendimentos de plantão por tipo:</p>
-            <ul>
-                <li>Domingos e Feriados</li>
-                <li>Sábados</li>
-                <li>Plantão Noturno</li>
-                <li>Emergências</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Filtra dados para as unidades, anos e meses selecionados
-        df_filtered = df4a[
-            (df4a['Unidade'].isin(unidade_selecionada)) &
-            (df4a['Ano'].isin(ano_selecionado)) &
-            (df4a['Mês'].isin(mes_selecionado))
-        ]
-        
+        # Totais por tipo de plantão (segmento 'Total', da Tabela4A)
+        somas = fatos.reduzir(['medida', 'tipo'], *selecao, segmento='Total')
+        tipos = fatos.rotulos['tipo']
+        nomes = [NOMES_DISTRIBUICAO_PLANTAO.get(t, t) for t in tipos]
+
         # Cria gráfico de distribuição
         fig = make_subplots(rows=1, cols=2, 
                            subplot_titles=('Volume de Atendimentos', 'Faturamento'),
                            specs=[[{"type": "pie"}, {"type": "pie"}]])
         
-        # Distribuição do volume de atendimentos
-        atendimentos = {
-            'Domingos e Feriados': df_filtered['Total Consulta Plantão Domingo/Feriado'].sum(),
-            'Sábados': df_filtered['Total Consulta Plantão Sábado'].sum(),
-            'Plantão Noturno': df_filtered['Total Consulta Plantão Noturno'].sum(),
-            'Emergências': df_filtered['Total Consulta Procedimento Emergencial Plantão'].sum()
-        }
-        
-        # Distribuição do faturamento
-        faturamento = {
-            'Domingos e Feriados': df_filtered['Faturamento Líquido Total Consulta Plantão Domingo/Feriado'].sum(),
-            'Sábados': df_filtered['Faturamento Líquido Total Consulta Plantão Sábado'].sum(),
-            'Plantão Noturno': df_filtered['Faturamento Líquido Total Consulta Plantão Noturno'].sum(),
-            'Emergências': df_filtered['Faturamento Líquido Total Consulta Procedimento Emergencial Plantão'].sum()
-        }
-        
         fig.add_trace(
-            go.Pie(labels=list(atendimentos.keys()),
-                  values=list(atendimentos.values()),
+            go.Pie(labels=nomes,
+                  values=[somas.get(('consultas', t), 0) for t in tipos],
                   name="Volume"),
             row=1, col=1
         )
         
         fig.add_trace(
-            go.Pie(labels=list(faturamento.keys()),
-                  values=list(faturamento.values()),
+            go.Pie(labels=nomes,
+                  values=[somas.get(('faturamento', t), 0) for t in tipos],
                   name="Faturamento"),
             row=1, col=2
         )
@@ -1532,47 +3068,12 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
         return fig
         
     elif tipo == 'Plantão por Dia':
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Esta visualização apresenta uma análise detalhada dos atendimentos de plantão por dia específico:</p>
-            <ul>
-                <li><strong>Gráfico Superior - Domingos e Feriados:</strong>
-                    <ul>
-                        <li>Mostra o volume de atendimentos em plantões aos domingos e feriados</li>
-                        <li>Diferencia entre novos clientes e retornantes</li>
-                        <li>Permite visualizar padrões de demanda em finais de semana/feriados</li>
-                    </ul>
-                </li>
-                <li><strong>Gráfico Inferior - Sábados:</strong>
-                    <ul>
-                        <li>Apresenta o volume de atendimentos em plantões aos sábados</li>
-                        <li>Separa entre novos clientes e retornantes</li>
-                        <li>Identifica a demanda específica dos sábados</li>
-                    </ul>
-                </li>
-            </ul>
-            <p>Use esta análise para:</p>
-            <ul>
-                <li>Otimizar a escala de profissionais nos diferentes dias</li>
-                <li>Identificar períodos de maior demanda</li>
-                <li>Comparar o perfil de atendimento entre sábados e domingos/feriados</li>
-                <li>Planejar recursos específicos para cada tipo de dia</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-        df_filtered_b = df4b[
-            (df4b['Unidade'].isin(unidade_selecionada)) &
-            (df4b['Ano'].isin(ano_selecionado)) &
-            (df4b['Mês'].isin(mes_selecionado))
-        ]
-        
-        df_filtered_c = df4c[
-            (df4c['Unidade'].isin(unidade_selecionada)) &
-            (df4c['Ano'].isin(ano_selecionado)) &
-            (df4c['Mês'].isin(mes_selecionado))
-        ]
+        # Consultas mensais de novos e retornantes do Google nos fins de semana
+        somas = fatos.reduzir(
+            ['tipo', 'segmento', 'ano', 'mes'], *selecao,
+            medida='consultas', tipo=['Domingo/Feriado', 'Sábado'],
+            segmento=['Google Novos', 'Google Retornantes']
+        )
         
         # Cria os subplots
         fig = make_subplots(rows=2, cols=1,
@@ -1580,68 +3081,29 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
                            vertical_spacing=0.2)
         
         # Definição de cores específicas para cada tipo e ano
+        # (2023: azul e laranja; 2024: verde e vermelho; tons escuros para
+        # novos e claros para retornantes; demais anos usam paletas geradas)
         cores = {
-            2023: {
-                'Novos Dom/Fer': '#1f77b4',     # Azul escuro
-                'Retornantes Dom/Fer': '#aec7e8', # Azul claro
-                'Novos Sáb': '#ff7f0e',         # Laranja escuro
-                'Retornantes Sáb': '#ffbb78'    # Laranja claro
-            },
-            2024: {
-                'Novos Dom/Fer': '#2ca02c',     # Verde escuro
-                'Retornantes Dom/Fer': '#98df8a', # Verde claro
-                'Novos Sáb': '#d62728',         # Vermelho escuro
-                'Retornantes Sáb': '#ff9896'    # Vermelho claro
-            }
+            'Novos Dom/Fer': cores_por_ano(ano_selecionado, ['#1f77b4', '#2ca02c'], 'Blues', faixa=(1.0, 0.6)),
+            'Retornantes Dom/Fer': cores_por_ano(ano_selecionado, ['#aec7e8', '#98df8a'], 'Blues', faixa=(0.55, 0.2)),
+            'Novos Sáb': cores_por_ano(ano_selecionado, ['#ff7f0e', '#d62728'], 'Oranges', faixa=(1.0, 0.6)),
+            'Retornantes Sáb': cores_por_ano(ano_selecionado, ['#ffbb78', '#ff9896'], 'Oranges', faixa=(0.55, 0.2))
         }
         
-        # Domingos e Feriados
-        for ano in sorted(ano_selecionado):
-            df_ano_b = df_filtered_b[df_filtered_b['Ano'] == ano]
-            
-            fig.add_trace(
-                go.Bar(
-                    name=f'Novos Dom/Fer {ano}',
-                    x=df_ano_b['Mês'],
-                    y=df_ano_b['Total Consulta Plantão Domingo/Feriado - Google Novos'],
-                    marker_color=cores[ano]['Novos Dom/Fer']
-                ),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Bar(
-                    name=f'Retornantes Dom/Fer {ano}',
-                    x=df_ano_b['Mês'],
-                    y=df_ano_b['Total Consulta Plantão Domingo/Feriado - Google Retornantes'],
-                    marker_color=cores[ano]['Retornantes Dom/Fer']
-                ),
-                row=1, col=1
-            )
-        
-        # Sábados
-        for ano in sorted(ano_selecionado):
-            df_ano_c = df_filtered_c[df_filtered_c['Ano'] == ano]
-            
-            fig.add_trace(
-                go.Bar(
-                    name=f'Novos Sáb {ano}',
-                    x=df_ano_c['Mês'],
-                    y=df_ano_c['Total Consulta Plantão Sábado - Google Novos'],
-                    marker_color=cores[ano]['Novos Sáb']
-                ),
-                row=2, col=1
-            )
-            
-            fig.add_trace(
-                go.Bar(
-                    name=f'Retornantes Sáb {ano}',
-                    x=df_ano_c['Mês'],
-                    y=df_ano_c['Total Consulta Plantão Sábado - Google Retornantes'],
-                    marker_color=cores[ano]['Retornantes Sáb']
-                ),
-                row=2, col=1
-            )
+        # Domingos e Feriados no painel de cima, Sábados no de baixo
+        for linha, (tipo_plantao, sufixo) in enumerate([('Domingo/Feriado', 'Dom/Fer'), ('Sábado', 'Sáb')], start=1):
+            for ano in anos:
+                for segmento, nome in [('Google Novos', 'Novos'), ('Google Retornantes', 'Retornantes')]:
+                    meses, valores = serie_mensal(somas, tipo_plantao, segmento, int(ano))
+                    fig.add_trace(
+                        go.Bar(
+                            name=f'{nome} {sufixo} {ano}',
+                            x=meses,
+                            y=valores,
+                            marker_color=cores[f'{nome} {sufixo}'][ano]
+                        ),
+                        row=linha, col=1
+                    )
         
         fig.update_layout(
             height=800,
@@ -1665,90 +3127,35 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
         return fig
         
     elif tipo == 'Plantão Emergencial':
-        # Explicação do gráfico
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Esta visualização analisa os atendimentos noturnos realizados durante o plantão:</p>
-            <ul>
-                <li><strong>Gráfico Superior - Volume de Atendimentos:</strong>
-                    <ul>
-                        <li>Mostra a quantidade de atendimentos noturnos por mês</li>
-                        <li>Permite identificar períodos de maior demanda</li>
-                        <li>Compara volumes entre diferentes anos</li>
-                    </ul>
-                </li>
-                <li><strong>Gráfico Inferior - Faturamento:</strong>
-                    <ul>
-                        <li>Apresenta o faturamento gerado pelos atendimentos noturnos</li>
-                        <li>Permite análise da sazonalidade do faturamento</li>
-                        <li>Compara desempenho financeiro entre períodos</li>
-                    </ul>
-                </li>
-            </ul>
-            <p>Use esta análise para:</p>
-            <ul>
-                <li>Planejar equipes de plantão noturno</li>
-                <li>Identificar períodos que requerem mais recursos</li>
-                <li>Avaliar o impacto financeiro dos atendimentos noturnos</li>
-                <li>Otimizar processos em períodos de alta demanda</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Filtra os dados
-        df_filtered = df4e[
-            (df4e['Unidade'].isin(unidade_selecionada)) &
-            (df4e['Ano'].isin(ano_selecionado)) &
-            (df4e['Mês'].isin(mes_selecionado))
-        ]
+        # Atendimentos noturnos de novos e retornantes do Google (Tabela4E)
+        somas = fatos.reduzir(
+            ['segmento', 'medida', 'ano', 'mes'], *selecao,
+            tipo='Noturno', segmento=['Google Novos', 'Google Retornantes']
+        )
         
         fig = make_subplots(rows=2, cols=1,
                            subplot_titles=('Volume de Atendimentos Noturnos',
                                          'Faturamento dos Plantões Noturnos'),
                            vertical_spacing=0.2)
         
-        # Add traces for volume
-        for ano in sorted(ano_selecionado):
-            df_ano = df_filtered[df_filtered['Ano'] == ano]
-            
-            # Novos pacientes
-            fig.add_trace(
-                go.Scatter(x=df_ano['Mês'],
-                          y=df_ano['Total Consulta Plantão Noturno Google Novos'],
-                          name=f'Novos {ano}',
-                          mode='lines+markers'),
-                row=1, col=1
-            )
-            
-            # Retornantes
-            fig.add_trace(
-                go.Scatter(x=df_ano['Mês'],
-                          y=df_ano['Total Consulta Plantão Noturno Google Retornantes'],
-                          name=f'Retornantes {ano}',
-                          mode='lines+markers',
-                          line=dict(dash='dash')),
-                row=1, col=1
-            )
-            
-            # Faturamento Novos
-            fig.add_trace(
-                go.Scatter(x=df_ano['Mês'],
-                          y=df_ano['Faturamento Líquido Total Consulta Plantão Noturno Google Novos'],
-                          name=f'Fat. Novos {ano}',
-                          mode='lines+markers'),
-                row=2, col=1
-            )
-            
-            # Faturamento Retornantes
-            fig.add_trace(
-                go.Scatter(x=df_ano['Mês'],
-                          y=df_ano['Faturamento Líquido Total Consulta Plantão Noturno Google Retornantes'],
-                          name=f'Fat. Retornantes {ano}',
-                          mode='lines+markers',
-                          line=dict(dash='dash')),
-                row=2, col=1
-            )
+        # Volume na linha de cima e faturamento na de baixo; retornantes tracejados
+        series = [
+            ('Google Novos', 'consultas', 'Novos', 1, {}),
+            ('Google Retornantes', 'consultas', 'Retornantes', 1, dict(line=dict(dash='dash'))),
+            ('Google Novos', 'faturamento', 'Fat. Novos', 2, {}),
+            ('Google Retornantes', 'faturamento', 'Fat. Retornantes', 2, dict(line=dict(dash='dash'))),
+        ]
+        for ano in anos:
+            for segmento, medida, nome, linha, estilo in series:
+                meses, valores = serie_mensal(somas, segmento, medida, int(ano))
+                fig.add_trace(
+                    go.Scatter(x=meses,
+                              y=valores,
+                              name=f'{nome} {ano}',
+                              mode='lines+markers',
+                              **estilo),
+                    row=linha, col=1
+                )
         
         fig.update_layout(
             height=800,
@@ -1771,43 +3178,8 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
         return fig
 
     elif tipo == 'Análise Temporal Plantão':
-        # Explicação do gráfico
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Esta visualização apresenta a evolução temporal dos diferentes tipos de plantão:</p>
-            <ul>
-                <li><strong>Gráfico Superior - Volume de Atendimentos:</strong>
-                    <ul>
-                        <li>Compara o volume de atendimentos entre os diferentes tipos de plantão</li>
-                        <li>Permite identificar tendências ao longo do tempo</li>
-                        <li>Mostra a distribuição entre dias úteis, fins de semana e feriados</li>
-                    </ul>
-                </li>
-                <li><strong>Gráfico Inferior - Faturamento por Tipo:</strong>
-                    <ul>
-                        <li>Apresenta o faturamento discriminado por tipo de plantão</li>
-                        <li>Permite comparar a rentabilidade de cada modalidade</li>
-                        <li>Mostra a evolução do faturamento ao longo do tempo</li>
-                    </ul>
-                </li>
-            </ul>
-            <p>Use esta análise para:</p>
-            <ul>
-                <li>Identificar padrões sazonais nos diferentes tipos de plantão</li>
-                <li>Otimizar a alocação de recursos por período</li>
-                <li>Avaliar o crescimento do serviço de plantão ao longo do tempo</li>
-                <li>Planejar melhorias específicas para cada tipo de atendimento</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Filtra os dados de plantão da Tabela4A
-        df_filtered = df4a[
-            (df4a['Unidade'].isin(unidade_selecionada)) &
-            (df4a['Ano'].isin(ano_selecionado)) &
-            (df4a['Mês'].isin(mes_selecionado))
-        ]
+        # Volume e faturamento mensais de cada tipo de plantão
+        somas = fatos.reduzir(['tipo', 'medida', 'ano', 'mes'], *selecao, segmento='Total')
         
         # Cria subplots
         fig = make_subplots(
@@ -1817,58 +3189,36 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
             vertical_spacing=0.2
         )
         
-        # Definição dos tipos de plantão e suas cores
-        tipos_plantao = {
-            'Domingo/Feriado': {
-                'volume': 'Total Consulta Plantão Domingo/Feriado',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Domingo/Feriado',
-                'cor': '#1f77b4'
-            },
-            'Sábado': {
-                'volume': 'Total Consulta Plantão Sábado',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Sábado',
-                'cor': '#ff7f0e'
-            },
-            'Noturno': {
-                'volume': 'Total Consulta Plantão Noturno',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Noturno',
-                'cor': '#2ca02c'
-            },
-            'Emergencial': {
-                'volume': 'Total Consulta Procedimento Emergencial Plantão',
-                'faturamento': 'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão',
-                'cor': '#d62728'
-            }
-        }
-        
         # Adiciona as linhas para cada tipo de plantão
-        for tipo, info in tipos_plantao.items():
-            for ano in sorted(ano_selecionado):
-                df_ano = df_filtered[df_filtered['Ano'] == ano]
+        for i, tipo_plantao in enumerate(fatos.rotulos['tipo']):
+            cor = cor_plantao(i, tipo_plantao)
+            for ano in anos:
                 
                 # Volume de atendimentos
+                meses, valores = serie_mensal(somas, tipo_plantao, 'consultas', int(ano))
                 fig.add_trace(
                     go.Scatter(
-                        x=df_ano['Mês'],
-                        y=df_ano[info['volume']],
-                        name=f'{tipo} {ano}',
+                        x=meses,
+                        y=valores,
+                        name=f'{tipo_plantao} {ano}',
                         mode='lines+markers',
-                        line=dict(color=info['cor']),
-                        legendgroup=f'grupo_{tipo}',
+                        line=dict(color=cor),
+                        legendgroup=f'grupo_{tipo_plantao}',
                         showlegend=True
                     ),
                     row=1, col=1
                 )
                 
                 # Faturamento
+                meses, valores = serie_mensal(somas, tipo_plantao, 'faturamento', int(ano))
                 fig.add_trace(
                     go.Scatter(
-                        x=df_ano['Mês'],
-                        y=df_ano[info['faturamento']],
-                        name=f'Fat. {tipo} {ano}',
+                        x=meses,
+                        y=valores,
+                        name=f'Fat. {tipo_plantao} {ano}',
                         mode='lines+markers',
-                        line=dict(color=info['cor'], dash='dash'),
-                        legendgroup=f'grupo_{tipo}',
+                        line=dict(color=cor, dash='dash'),
+                        legendgroup=f'grupo_{tipo_plantao}',
                         showlegend=True
                     ),
                     row=2, col=1
@@ -1897,67 +3247,10 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
 
 
     elif tipo == 'Comparativo Plantão':
-        # Explicação do gráfico
-        st.markdown("""
-        <div class="graph-explanation" style="color: white; background-color: #003366; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-            <h4 style="color: #FFFFFF;">Como interpretar este gráfico:</h4>
-            <p>Este gráfico apresenta uma análise comparativa detalhada dos diferentes tipos de plantão:</p>
-            <ul>
-                <li><strong>Gráfico Superior - Comparativo Mensal:</strong>
-                    <ul>
-                        <li>Compara o volume de atendimentos mês a mês para cada tipo de plantão</li>
-                        <li>Permite visualizar a distribuição dos atendimentos entre diferentes modalidades</li>
-                        <li>Identifica o peso de cada tipo de plantão no total de atendimentos</li>
-                    </ul>
-                </li>
-                <li><strong>Gráfico Inferior - Análise Financeira:</strong>
-                    <ul>
-                        <li>Compara o faturamento entre os diferentes tipos de plantão</li>
-                        <li>Mostra o ticket médio por tipo de plantão</li>
-                        <li>Permite avaliar a performance financeira de cada modalidade</li>
-                    </ul>
-                </li>
-            </ul>
-            <p>Use esta análise para:</p>
-            <ul>
-                <li>Identificar as modalidades de plantão mais demandadas</li>
-                <li>Comparar a eficiência financeira entre os tipos de plantão</li>
-                <li>Planejar a distribuição de recursos entre as modalidades</li>
-                <li>Tomar decisões sobre expansão ou ajuste dos serviços</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Filtra os dados
-        df_filtered = df4a[
-            (df4a['Unidade'].isin(unidade_selecionada)) &
-            (df4a['Ano'].isin(ano_selecionado)) &
-            (df4a['Mês'].isin(mes_selecionado))
-        ]
-        
         # Calcula as somas totais e médias para cada tipo de plantão
-        metricas_plantao = {
-            'Domingo/Feriado': {
-                'volume': 'Total Consulta Plantão Domingo/Feriado',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Domingo/Feriado',
-                'cor': '#1f77b4'
-            },
-            'Sábado': {
-                'volume': 'Total Consulta Plantão Sábado',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Sábado',
-                'cor': '#ff7f0e'
-            },
-            'Noturno': {
-                'volume': 'Total Consulta Plantão Noturno',
-                'faturamento': 'Faturamento Líquido Total Consulta Plantão Noturno',
-                'cor': '#2ca02c'
-            },
-            'Emergencial': {
-                'volume': 'Total Consulta Procedimento Emergencial Plantão',
-                'faturamento': 'Faturamento Líquido Total Consulta Procedimento Emergencial Plantão',
-                'cor': '#d62728'
-            }
-        }
+        somas = fatos.reduzir(['medida', 'tipo'], *selecao, segmento='Total')
+        tipos = fatos.rotulos['tipo']
+        cores = [cor_plantao(i, t) for i, t in enumerate(tipos)]
         
         # Cria subplots
         fig = make_subplots(
@@ -1969,14 +3262,11 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
         )
         
         # Dados para os gráficos
-        volumes = {}
-        faturamentos = {}
-        tickets_medios = {}
-        
-        for tipo, info in metricas_plantao.items():
-            volumes[tipo] = df_filtered[info['volume']].sum()
-            faturamentos[tipo] = df_filtered[info['faturamento']].sum()
-            tickets_medios[tipo] = faturamentos[tipo] / volumes[tipo] if volumes[tipo] > 0 else 0
+        volumes = {t: somas.get(('consultas', t), 0) for t in tipos}
+        faturamentos = {t: somas.get(('faturamento', t), 0) for t in tipos}
+        tickets_medios = {
+            t: faturamentos[t] / volumes[t] if volumes[t] > 0 else 0 for t in tipos
+        }
         
         # 1. Gráfico de barras - Volume
         fig.add_trace(
@@ -1984,7 +3274,7 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
                 x=list(volumes.keys()),
                 y=list(volumes.values()),
                 name='Volume',
-                marker_color=[info['cor'] for info in metricas_plantao.values()]
+                marker_color=cores
             ),
             row=1, col=1
         )
@@ -1994,7 +3284,7 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
             go.Pie(
                 labels=list(volumes.keys()),
                 values=list(volumes.values()),
-                marker_colors=[info['cor'] for info in metricas_plantao.values()]
+                marker_colors=cores
             ),
             row=1, col=2
         )
@@ -2005,7 +3295,7 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
                 x=list(faturamentos.keys()),
                 y=list(faturamentos.values()),
                 name='Faturamento',
-                marker_color=[info['cor'] for info in metricas_plantao.values()]
+                marker_color=cores
             ),
             row=2, col=1
         )
@@ -2016,7 +3306,7 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
                 x=list(tickets_medios.keys()),
                 y=list(tickets_medios.values()),
                 name='Ticket Médio',
-                marker_color=[info['cor'] for info in metricas_plantao.values()]
+                marker_color=cores
             ),
             row=2, col=2
         )
@@ -2051,6 +3341,177 @@ def criar_grafico_plantao(df4a, df4b, df4c, df4d, df4e, tipo, unidade_selecionad
         </div>
     """, unsafe_allow_html=True)
 
-# Chamada da função principal
+# Relatórios sem a interface: python dashboard.py [arquivo ou pasta] --saida relatorios
+FORMATOS_RELATORIO = ['html', 'png', 'svg', 'pdf']
+
+MODELO_RELATORIO = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<script src="../plotly.min.js"></script>
+</head>
+<body>
+<h1>{titulo}</h1>
+{graficos}
+</body>
+</html>
+"""
+
+# Tabelas usadas pelos processos que geram os relatórios, recebidas uma
+# única vez por processo na inicialização do pool
+_tabelas_relatorio = None
+
+def _silenciar_streamlit():
+    """Sem interface, os avisos do Streamlit em cada chamada são só ruído"""
+    # A configuração é lida antes: a leitura tardia restauraria o nível do log
+    st.config.get_config_options()
+    streamlit.logger.set_log_level('error')
+
+def _iniciar_processo_relatorio(tabelas, origem=None):
+    """Inicialização de cada processo do pool: guarda as tabelas já carregadas"""
+    global _tabelas_relatorio
+    _silenciar_streamlit()
+    if tabelas is None:
+        # Tabelas compartilhadas: o processo mapeia as que já foram
+        # publicadas no sidecar, em vez de receber uma cópia
+        tabelas = carregar_origem(origem)
+        tabelas.antecipar(TABELAS)
+    _tabelas_relatorio = tabelas
+
+def _nome_arquivo(texto):
+    """Remove do texto os caracteres que não podem ir no nome de um arquivo"""
+    return ''.join('_' if c in '\\/:*?"<>|' else c for c in str(texto)).strip()
+
+def gerar_relatorio(unidade, ano, pasta_saida, formato):
+    """Gera todas as métricas de uma unidade em um ano; retorna (arquivos, falhas)"""
+    pasta = os.path.join(pasta_saida, _nome_arquivo(unidade))
+    figuras, falhas = [], []
+    for categoria, metricas in METRICAS_DISPONIVEIS.items():
+        for metrica in metricas:
+            try:
+                fig = construir_grafico(
+                    categoria, metrica, _tabelas_relatorio,
+                    [unidade], [ano], ORDEM_MESES
+                )
+            except Exception as e:
+                fig = None
+                falhas.append(f'{unidade} {ano} {categoria}/{metrica}: {e}')
+            if fig is not None:
+                figuras.append((categoria, metrica, fig))
+
+    if formato == 'html':
+        # Um relatório por unidade e ano; o plotly.js fica em um único
+        # arquivo na pasta de saída, compartilhado por todos
+        os.makedirs(pasta, exist_ok=True)
+        titulo = html.escape(f'{unidade} - {ano}')
+        graficos = '\n'.join(
+            f'<h2>{html.escape(categoria)} - {html.escape(metrica)}</h2>\n'
+            + fig.to_html(full_html=False, include_plotlyjs=False, validate=False)
+            for categoria, metrica, fig in figuras
+        )
+        arquivo = os.path.join(pasta, f'{ano}.html')
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(MODELO_RELATORIO.format(titulo=titulo, graficos=graficos))
+        return [arquivo], falhas
+
+    pasta = os.path.join(pasta, str(ano))
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = []
+    for categoria, metrica, fig in figuras:
+        arquivo = os.path.join(pasta, _nome_arquivo(f'{categoria} - {metrica}') + f'.{formato}')
+        fig.write_image(arquivo, width=1200, validate=False)
+        arquivos.append(arquivo)
+    return arquivos, falhas
+
+def carregar_origem(origem):
+    """Carrega o arquivo Excel ou todas as planilhas de uma pasta, sem a interface"""
+    if os.path.isdir(origem):
+        fontes = tuple(
+            (caminho, _assinatura_arquivo(caminho)[2]) for caminho in descobrir_planilhas(origem)
+        )
+        if not fontes:
+            raise FileNotFoundError(f'Nenhuma planilha .xlsx em {origem}')
+        return _carregar_fontes(fontes)
+    caminho, _, conteudo_hash = _assinatura_arquivo(origem)
+    return _carregar_tabelas(caminho, conteudo_hash)
+
+def gerar_relatorios(origem, pasta_saida, formato='html', processos=None):
+    """Gera os relatórios de todas as combinações de unidade e ano em um pool de processos"""
+    # Todos os gráficos são gerados: as planilhas são lidas aqui, todas de uma vez
+    try:
+        tabelas = carregar_origem(origem)
+        tabelas.antecipar(TABELAS)
+    except Exception as e:
+        # Sem as tabelas nenhum relatório é gerado: a falha é devolvida como as demais
+        return [], [f'Erro ao carregar dados: {str(e)}']
+    df1 = tabelas['Tabela1']
+    combinacoes = sorted(
+        df1[['Unidade', 'Ano']].drop_duplicates().itertuples(index=False, name=None),
+        key=lambda par: (str(par[0]), par[1])
+    )
+    os.makedirs(pasta_saida, exist_ok=True)
+    if formato == 'html':
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(pasta_saida, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+
+    # O Excel é lido uma única vez aqui; cada processo recebe as tabelas na
+    # inicialização (ou as mapeia do sidecar, no modo compartilhado) e depois
+    # só os pares (unidade, ano) que deve gerar
+    if TABELAS_COMPARTILHADAS and tabelas.plano is not None and tabelas.plano['gravadas'] >= set(TABELAS):
+        iniciar = (None, origem)
+    else:
+        iniciar = (tabelas.carregadas(),)
+    arquivos, falhas = [], []
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(processos or os.cpu_count() or 1, len(combinacoes))),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_iniciar_processo_relatorio,
+        initargs=iniciar
+    ) as executor:
+        futuros = [
+            executor.submit(gerar_relatorio, str(unidade), int(ano), pasta_saida, formato)
+            for unidade, ano in combinacoes
+        ]
+        for futuro in futuros:
+            gerados, erros = futuro.result()
+            arquivos.extend(gerados)
+            falhas.extend(erros)
+    return arquivos, falhas
+
+def main_relatorios(argv=None):
+    """Linha de comando para gerar os relatórios sem abrir o dashboard"""
+    parser = argparse.ArgumentParser(
+        description='Gera os gráficos de todas as métricas para cada unidade e ano.'
+    )
+    parser.add_argument('origem', nargs='?', default=ARQUIVO_EXCEL,
+                        help='arquivo Excel ou pasta com uma planilha por unidade')
+    parser.add_argument('--saida', default='relatorios', help='pasta onde os arquivos são gravados')
+    parser.add_argument('--formato', choices=FORMATOS_RELATORIO, default='html',
+                        help='html (um relatório por unidade e ano) ou imagem por gráfico (requer kaleido)')
+    parser.add_argument('--processos', type=int, default=None,
+                        help='número de processos (padrão: número de CPUs)')
+    args = parser.parse_args(argv)
+    _silenciar_streamlit()
+
+    if args.formato != 'html':
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error(f'o formato {args.formato} requer o pacote kaleido (pip install kaleido)')
+
+    inicio = datetime.now()
+    arquivos, falhas = gerar_relatorios(args.origem, args.saida, args.formato, args.processos)
+    for falha in falhas:
+        print(f'Falha: {falha}', file=sys.stderr)
+    print(f'{len(arquivos)} arquivos gerados em {args.saida} '
+          f'({(datetime.now() - inicio).total_seconds():.1f} s)')
+    return 1 if falhas else 0
+
+# Chamada da função principal; fora do Streamlit (python dashboard.py)
+# gera os relatórios pela linha de comando
 if __name__ == '__main__':
+    if get_script_run_ctx() is None:
+        sys.exit(main_relatorios())
     criar_dashboard()
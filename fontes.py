@@ -0,0 +1,253 @@
+"""Leitura das planilhas do Excel, sem dependência do Streamlit.
+
+Fica em um módulo próprio para que as funções possam ser executadas em
+outros processos (o script do Streamlit não pode ser importado por eles).
+"""
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Planilhas lidas do Excel, na ordem em que load_data as retorna
+TABELAS = [
+    'Tabela1', 'Tabela2', 'Tabela3',
+    'Tabela4A', 'Tabela4B', 'Tabela4C', 'Tabela4D', 'Tabela4E',
+    'Tabela5', 'Tabela7'
+]
+
+# Ordem cronológica dos meses, usada nos filtros e na ordenação dos gráficos
+ORDEM_MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+               'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+# Linhas de título acima do cabeçalho em cada planilha
+LINHAS_TITULO = 2
+
+# Coluna com o nome da planilha de origem quando várias são combinadas
+COLUNA_FONTE = 'Fonte'
+
+# Linhas reservadas por coluna quando a planilha não informa sua dimensão
+CAPACIDADE_INICIAL = 1024
+
+class _Coluna:
+    """Buffer pré-alocado de uma coluna lida em streaming"""
+
+    def __init__(self, capacidade):
+        # Começa numérica (float64, NaN nas vazias) e passa a object quando
+        # aparece um texto que não é número
+        self.valores = np.full(capacidade, np.nan)
+        self.texto = False
+        # Textos repetidos (Unidade, Mês) compartilham o mesmo objeto
+        self.internados = {}
+
+    def crescer(self, capacidade):
+        novos = np.full(capacidade, None if self.texto else np.nan, dtype=self.valores.dtype)
+        novos[:len(self.valores)] = self.valores
+        self.valores = novos
+
+    def gravar(self, i, valor):
+        if valor is None:
+            return
+        if not self.texto:
+            if isinstance(valor, (int, float)):
+                self.valores[i] = valor
+                return
+            # Números gravados como texto (o Ano, por exemplo) viram números,
+            # como no pd.read_excel
+            if isinstance(valor, str):
+                try:
+                    self.valores[i] = float(valor)
+                    return
+                except ValueError:
+                    pass
+            self.valores = self.valores.astype(object)
+            self.texto = True
+        if isinstance(valor, str):
+            valor = self.internados.setdefault(valor, valor)
+        self.valores[i] = valor
+
+    def serie(self, n):
+        valores = self.valores[:n]
+        if self.texto:
+            valores = np.where(pd.isna(valores), None, valores)
+            return pd.Series(valores, dtype='str' if all(v is None or isinstance(v, str) for v in valores) else object)
+        # Coluna inteira e sem vazios vira int64, como no pd.read_excel
+        if n and not np.isnan(valores).any() and (valores == np.trunc(valores)).all():
+            return pd.Series(valores.astype('int64'))
+        return pd.Series(valores)
+
+def ler_planilha(livro, nome):
+    """Lê uma planilha linha a linha (somente valores) em buffers por coluna"""
+    folha = livro[nome]
+    linhas = folha.iter_rows(min_row=LINHAS_TITULO + 1, values_only=True)
+    cabecalho = list(next(linhas, ()))
+    # Colunas sem cabeçalho no fim da planilha são descartadas
+    while cabecalho and cabecalho[-1] is None:
+        cabecalho.pop()
+    # A dimensão declarada na planilha dá o número de linhas de dados; sem
+    # ela, os buffers crescem dobrando de tamanho
+    capacidade = (folha.max_row or 0) - LINHAS_TITULO - 1
+    if capacidade <= 0:
+        capacidade = CAPACIDADE_INICIAL
+    colunas = [_Coluna(capacidade) for _ in cabecalho]
+    n = 0
+    for linha in linhas:
+        valores = linha[:len(colunas)]
+        # Linhas em branco são ignoradas
+        if all(valor is None for valor in valores):
+            continue
+        if n == capacidade:
+            capacidade *= 2
+            for coluna in colunas:
+                coluna.crescer(capacidade)
+        for coluna, valor in zip(colunas, valores):
+            coluna.gravar(n, valor)
+        n += 1
+    return pd.DataFrame({
+        str(nome_coluna): coluna.serie(n) for nome_coluna, coluna in zip(cabecalho, colunas)
+    })
+
+def ler_planilhas(excel_file, nomes=TABELAS):
+    """Lê as planilhas pedidas abrindo o arquivo Excel uma única vez; retorna {nome: DataFrame}"""
+    # Modo somente leitura do openpyxl: as linhas são lidas em streaming do
+    # XML, sem montar o workbook inteiro, e gravadas direto nas colunas.
+    # O openpyxl é importado só aqui: com o sidecar ele não é necessário
+    import openpyxl
+    livro = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        return {nome: ler_planilha(livro, nome) for nome in nomes}
+    finally:
+        livro.close()
+
+def normalizar_tabela(df):
+    """Padroniza o Mês como categoria ordenada e ordena a tabela por Ano e Mês"""
+    meses = pd.Categorical(df['Mês'].str.strip().str.capitalize(), categories=ORDEM_MESES, ordered=True)
+    # Número do mês (1-12, 0 se desconhecido) e chave de período no formato AAAAMM
+    mes_num = (meses.codes + 1).astype('int8')
+    df = df.assign(**{
+        'Mês': meses,
+        'Mês Num': mes_num,
+        'Período': (df['Ano'] * 100 + mes_num).astype('int32'),
+    })
+    # Ordenação estável: dentro do mesmo mês mantém a ordem da planilha
+    return df.sort_values(['Ano', 'Mês'], kind='stable').reset_index(drop=True)
+
+# Esquema das tabelas carregadas. Colunas fora do esquema seguem a regra:
+# contagens inteiras em int32 e valores em reais em float32 apenas quando a
+# precisão de centavos é preservada (senão float64)
+ESQUEMA = {
+    'Unidade': 'category',
+    COLUNA_FONTE: 'category',
+    'Ano': 'int16',
+    'Mês Num': 'int8',
+    'Período': 'int32',
+}
+
+def float32_preserva_centavos(serie):
+    """Indica se a coluna pode ser float32 sem perder centavos, inclusive na soma"""
+    valores = serie.abs()
+    if valores.isna().all():
+        return True
+    # O total precisa caber com erro < meio centavo, e o arredondamento de
+    # cada valor para float32, acumulado em todas as linhas, também
+    erro_acumulado = len(valores) * float(np.spacing(np.float32(valores.max()))) / 2
+    return valores.sum() < 2 ** 16 and erro_acumulado < 0.005
+
+def aplicar_esquema(df):
+    """Converte as colunas para os tipos compactos do esquema declarado"""
+    tipos = {}
+    for coluna in df.columns:
+        if coluna in ESQUEMA:
+            tipos[coluna] = ESQUEMA[coluna]
+        elif pd.api.types.is_integer_dtype(df[coluna]):
+            tipos[coluna] = 'int32'
+        elif pd.api.types.is_float_dtype(df[coluna]):
+            tipos[coluna] = 'float32' if float32_preserva_centavos(df[coluna]) else 'float64'
+    return df.astype(tipos)
+
+def ler_tabelas(caminho, nomes=TABELAS):
+    """Lê, normaliza e compacta as planilhas pedidas; retorna {nome: DataFrame}"""
+    planilhas = ler_planilhas(caminho, nomes)
+    return {nome: aplicar_esquema(normalizar_tabela(planilhas[nome])) for nome in nomes}
+
+def descobrir_planilhas(pasta):
+    """Lista os arquivos .xlsx da pasta, ignorando os temporários do Excel"""
+    return sorted(
+        os.path.abspath(caminho)
+        for caminho in glob.glob(os.path.join(pasta, '*.xlsx'))
+        if not os.path.basename(caminho).startswith('~$')
+    )
+
+def nome_fonte(caminho):
+    """Nome da planilha de origem, usado na coluna Fonte"""
+    return os.path.splitext(os.path.basename(caminho))[0]
+
+def unidades_da_planilha(caminho):
+    """Lista as unidades da Tabela1 lendo apenas a coluna Unidade"""
+    # Bem mais barato que ler_tabelas: uma planilha e uma coluna, sem pandas
+    import openpyxl
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro['Tabela1'].iter_rows(min_row=LINHAS_TITULO + 1, values_only=True)
+        cabecalho = next(linhas, ())
+        if 'Unidade' not in cabecalho:
+            return []
+        coluna = cabecalho.index('Unidade')
+        unidades = set()
+        for linha in linhas:
+            if coluna < len(linha) and linha[coluna] is not None:
+                unidades.add(str(linha[coluna]))
+        return sorted(unidades)
+    finally:
+        livro.close()
+
+# Threads que observam arquivos, no máximo uma por caminho no processo:
+# {caminho: (thread, evento de parada)}. O registro fica neste módulo,
+# importado uma única vez, e não no script do Streamlit, executado de novo a
+# cada rerun e cujos caches podem ser esvaziados
+_observadores = {}
+_trava_observadores = threading.Lock()
+
+def iniciar_observador_arquivo(caminho, observar):
+    """Executa observar(caminho, parar) em uma thread, se não houver uma viva para o caminho"""
+    with _trava_observadores:
+        atual = _observadores.get(caminho)
+        if atual is not None and atual[0].is_alive():
+            return atual[0]
+        parar = threading.Event()
+        thread = threading.Thread(
+            target=observar, args=(caminho, parar),
+            name='observador-excel', daemon=True
+        )
+        thread.start()
+        _observadores[caminho] = (thread, parar)
+        return thread
+
+def parar_observador_arquivo(caminho, espera=None):
+    """Sinaliza o fim do observador do caminho e espera a thread terminar"""
+    with _trava_observadores:
+        atual = _observadores.pop(caminho, None)
+    if atual is None:
+        return False
+    thread, parar = atual
+    parar.set()
+    thread.join(espera)
+    return True
+
+def concatenar_fontes(tabelas_por_fonte):
+    """Combina as tabelas de várias planilhas; recebe {fonte: tupla na ordem de TABELAS}"""
+    combinadas = []
+    for i, nome in enumerate(TABELAS):
+        partes = [
+            tabelas[i].assign(**{COLUNA_FONTE: fonte})
+            for fonte, tabelas in tabelas_por_fonte.items()
+        ]
+        df = pd.concat(partes, ignore_index=True)
+        # As colunas float32 de cada fonte só garantem os centavos do próprio
+        # total: o esquema é reaplicado ao conjunto a partir de float64, e
+        # Unidade/Fonte voltam a ser categorias únicas para toda a tabela
+        flutuantes = [c for c in df.columns if df[c].dtype == np.float32]
+        df = aplicar_esquema(df.astype({c: 'float64' for c in flutuantes}))
+        combinadas.append(df.sort_values(['Ano', 'Mês'], kind='stable').reset_index(drop=True))
+    return tuple(combinadas)